@@ -3,6 +3,11 @@ ASGI config for dani project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live price feed (``/events/``) is an async view and must be served from
+here, e.g. ``uvicorn dani.asgi:application``, with the front proxy routing
+``/events/`` to it; the rest of the site can stay on ``dani.wsgi``. Under WSGI
+the feed answers 204 and the index page polls ``price_changes.csv`` instead.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
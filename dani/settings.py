@@ -11,9 +11,12 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 import ssl
+from datetime import timedelta
 from pathlib import Path
 from celery.schedules import crontab
 
+from dani import storage
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,15 +45,55 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = os.environ.get('CELERY_TIMEZONE', 'UTC') # Fallback to UTC
 
-CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# DatabaseScheduler plus adaptive crawl bookkeeping (see danimax/scheduler.py)
+CELERY_BEAT_SCHEDULER = 'danimax.scheduler:AdaptiveScheduler'
+
+# Adaptive scraping: each listing page is revisited based on how often its prices change,
+# within a global daily request budget (the old fixed schedule used ~156 requests/day).
+ADAPTIVE_SCRAPE_DAILY_REQUEST_BUDGET = int(os.environ.get('ADAPTIVE_SCRAPE_DAILY_REQUEST_BUDGET', 120))
+ADAPTIVE_SCRAPE_TICK_MINUTES = 15
+ADAPTIVE_SCRAPE_MIN_INTERVAL_HOURS = 1
+ADAPTIVE_SCRAPE_MAX_INTERVAL_HOURS = 48
+ADAPTIVE_SCRAPE_TARGET_CHANGE_FRACTION = 0.05 # Aim for ~5% of a page's listings changing between visits
+ADAPTIVE_SCRAPE_SMOOTHING = 0.3 # EWMA weight of the latest observation
 
 CELERY_BEAT_SCHEDULE = {
-    'scrape-atomo-every-12-hours': {
-        'task': 'run_atomo_scraper', # Name of the task from @shared_task
-        'schedule': crontab(minute='0', hour='9,21'), # Run at 9:00 AM and 9:00 PM
+    'adaptive-scrape-tick': {
+        'task': 'scrape_due_pages', # Scrapes whichever pages are due; run_atomo_scraper is still available for full crawls
+        'schedule': timedelta(minutes=ADAPTIVE_SCRAPE_TICK_MINUTES),
+    },
+    'archive-price-history-daily': {
+        'task': 'archive_price_history',
+        'schedule': crontab(minute='0', hour='4'), # Off-peak; safe alongside scrape ticks (see tasks.publish_price_log)
     },
 }
 
+# Price history tiers (see danimax/history.py): the last N days stay in SQLite,
+# older rows move to month-partitioned Parquet files.
+PRICE_HISTORY_HOT_DAYS = int(os.environ.get('PRICE_HISTORY_HOT_DAYS', 90))
+PRICE_HISTORY_ARCHIVE_DIR = os.environ.get('PRICE_HISTORY_ARCHIVE_DIR', BASE_DIR / 'price_history_archive')
+
+# Live price-change feed (see danimax/events.py). The scraper runs in the Celery
+# worker, so events go through the same Redis as the broker (including its local
+# fallback). 'memory' only works in a single process; set it explicitly for dev/tests.
+PRICE_EVENTS_BACKEND = os.environ.get('PRICE_EVENTS_BACKEND', 'redis')
+PRICE_EVENTS_REDIS_URL = os.environ.get('PRICE_EVENTS_REDIS_URL', CELERY_BROKER_URL)
+PRICE_EVENTS_STREAM = 'danimax:price-changes'
+PRICE_EVENTS_MAX_BACKLOG = 5000 # Events kept for clients resuming via Last-Event-ID
+PRICE_EVENTS_POLL_SECONDS = 2.0
+PRICE_EVENTS_KEEPALIVE_SECONDS = 15.0
+PRICE_EVENTS_STREAM_SECONDS = 300 # Recycle SSE connections; browsers reconnect automatically
+PRICE_EVENTS_RETRY_MS = 5000
+
+# HTTP caching (see danimax/http_cache.py). Responses are revalidated cheaply via
+# scrape-versioned ETags, so a short max-age is enough for proxies and CDNs.
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 300))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.environ.get('HTTP_CACHE_STALE_WHILE_REVALIDATE', 3600))
+
+# Admin changelists over large tables (see danimax/admin.py)
+ADMIN_ESTIMATED_COUNT_CAP = 10000 # Filtered changelists count at most this many rows
+ADMIN_BULK_ACTION_BATCH_SIZE = 1000 # Rows per background Celery job for admin bulk actions
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
@@ -118,11 +161,37 @@ WSGI_APPLICATION = 'dani.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuning shared by the web tier and the scraper (see dani/storage.py).
+# WAL lets page loads keep reading while the scraper writes its updates.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'), # Safe with WAL, far fewer fsyncs than FULL
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)), # Wait for locks instead of failing
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)), # Negative value means KiB
+}
+
+# Read-only alias used by the public views.
+READONLY_DATABASE = 'readonly'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            'init_command': storage.init_command(SQLITE_PRAGMAS),
+        },
+    },
+    READONLY_DATABASE: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': storage.read_only_uri(BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'init_command': storage.init_command(SQLITE_PRAGMAS, read_only=True),
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
 
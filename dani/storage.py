@@ -0,0 +1,47 @@
+"""
+Shared SQLite storage settings for the web tier and the scraper.
+
+Both ``DATABASES`` in settings.py and the Celery scraper in danimax/tasks.py
+open their SQLite files through the helpers below, so journaling, lock
+waiting and cache sizing are tuned from a single place.
+
+This module is imported by settings.py, so it must not touch
+``django.conf.settings`` at import time.
+"""
+import sqlite3
+
+# Pragmas that only make sense on a connection that is allowed to write.
+WRITE_ONLY_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def pragma_statements(pragmas, read_only=False):
+    """Returns the ``PRAGMA`` statements for the given pragma dict."""
+    statements = []
+    for name, value in pragmas.items():
+        if value is None or (read_only and name in WRITE_ONLY_PRAGMAS):
+            continue
+        statements.append(f"PRAGMA {name} = {value}")
+    if read_only:
+        statements.append("PRAGMA query_only = 1")
+    return statements
+
+
+def init_command(pragmas, read_only=False):
+    """Builds the ``OPTIONS['init_command']`` string for a Django SQLite alias."""
+    return '; '.join(pragma_statements(pragmas, read_only=read_only))
+
+
+def read_only_uri(db_path):
+    """Returns a SQLite URI that opens ``db_path`` in read-only mode."""
+    return f"file:{db_path}?mode=ro"
+
+
+def connect(db_path, pragmas, read_only=False):
+    """Opens a raw sqlite3 connection to ``db_path`` with the given pragmas applied."""
+    if read_only:
+        conn = sqlite3.connect(read_only_uri(db_path), uri=True)
+    else:
+        conn = sqlite3.connect(db_path)
+    for statement in pragma_statements(pragmas, read_only=read_only):
+        conn.execute(statement)
+    return conn
@@ -21,5 +21,7 @@ from danimax import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.index, name='index'),
-    path("<int:product_id>/", views.detail, name="detail")
+    path("<int:product_id>/", views.detail, name="detail"),
+    path("price_changes.csv", views.price_changes_csv, name="price_changes_csv"),
+    path("events/price-changes/", views.price_change_stream, name="price_change_stream"),
 ]
@@ -1,16 +1,120 @@
+import datetime
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db.models import F, Max, Min, Q
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 
-from .models import Product
+from .models import BulkActionJob, CrawlTarget, Product, ProductQuerySet
+from .tasks import mark_price_zero_task
+
+# Query parameter for keyset ("load next N") navigation in the Product changelist.
+CURSOR_VAR = 'cursor'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never runs COUNT(*) over the whole table.
+
+    Unfiltered lists estimate the count from the primary key range, filtered
+    ones count at most settings.ADMIN_ESTIMATED_COUNT_CAP rows.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            # Separate queries: SQLite only answers a lone MIN() or MAX() from the index.
+            manager = queryset.model._default_manager.using(queryset.db)
+            low = manager.aggregate(low=Min('pk'))['low']
+            if low is None:
+                return 0
+            return manager.aggregate(high=Max('pk'))['high'] - low + 1
+        return queryset.order_by()[:settings.ADMIN_ESTIMATED_COUNT_CAP].count()
+
+
+class ChangeListQuerySet(ProductQuerySet):
+    """Product queryset for the changelist only.
+
+    The date_hierarchy picks its start level with
+    aggregate(first=Min(field), last=Max(field)), which SQLite runs as a full
+    scan; that one call is answered by date_bounds() instead.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        first, last = kwargs.get('first'), kwargs.get('last')
+        if (not args and kwargs.keys() == {'first', 'last'} and type(first) is Min and type(last) is Max
+                and first.filter is None and last.filter is None
+                and first.get_source_expressions() == last.get_source_expressions()
+                and isinstance(first.get_source_expressions()[0], F)):
+            bounds = self.date_bounds(first.get_source_expressions()[0].name)
+            return dict(zip(('first', 'last'), bounds))
+        return super().aggregate(*args, **kwargs)
+
+
+class ProductChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return ChangeListQuerySet(model=queryset.model, query=queryset.query, using=queryset.db)
+
+
+def encode_cursor(product):
+    return f"{product.scraped_at.isoformat()}|{product.pk}"
+
+
+def decode_cursor(value):
+    """Returns (scraped_at, pk) from a cursor string, or None if it is malformed."""
+    try:
+        scraped_at, pk = value.rsplit('|', 1)
+        return datetime.datetime.fromisoformat(scraped_at), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'price_ars', 'short_url', 'scraped_at', 'preview_image')
-    list_filter = ('scraped_at',)
+    date_hierarchy = 'scraped_at'
     search_fields = ('name', 'url')
-    ordering = ('-scraped_at',)
+    ordering = ('-scraped_at', '-id')
     readonly_fields = ('scraped_at',)
     actions = ['mark_price_zero']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        # The changelist rejects unknown parameters, so take the cursor out of GET first.
+        cursor = None
+        if CURSOR_VAR in request.GET:
+            request.GET = request.GET.copy()
+            cursor = decode_cursor(request.GET.pop(CURSOR_VAR)[0])
+            if ORDER_VAR not in request.GET:
+                request.product_cursor = cursor
+        response = super().changelist_view(request, extra_context)
+
+        cl = getattr(response, 'context_data', {}).get('cl')
+        if cl is not None and ORDER_VAR not in request.GET:
+            results = list(cl.result_list)
+            if len(results) == cl.list_per_page:
+                response.context_data['next_cursor_url'] = cl.get_query_string(
+                    {CURSOR_VAR: encode_cursor(results[-1])}, [PAGE_VAR]
+                )
+            if cursor is not None:
+                response.context_data['first_page_url'] = cl.get_query_string(remove=[PAGE_VAR])
+        return response
+
+    def get_changelist(self, request, **kwargs):
+        return ProductChangeList
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        cursor = getattr(request, 'product_cursor', None)
+        if cursor:
+            scraped_at, pk = cursor
+            queryset = queryset.filter(Q(scraped_at__lt=scraped_at) | Q(scraped_at=scraped_at, pk__lt=pk))
+        return queryset
 
     def short_url(self, obj):
         return obj.url[:40] + '...' if len(obj.url) > 40 else obj.url
@@ -21,9 +125,36 @@ class ProductAdmin(admin.ModelAdmin):
     preview_image.short_description = 'Image'
     preview_image.allow_tags = True
 
-    def mark_price_zero(self, queryset):
-        queryset.update(price_ars=0)
-    mark_price_zero.short_description = 'Set selected prices to 0'
+    def mark_price_zero(self, request, queryset):
+        # Only the selection's SQL is handed over; counting and reading its
+        # rows happen in the worker, even when "select all" spans the table.
+        job = BulkActionJob.objects.create(action='Set prices to 0')
+        selection_sql, selection_params = queryset.order_by().values('pk').query.sql_with_params()
+        mark_price_zero_task.delay(job.pk, selection_sql, list(selection_params))
+        self.message_user(request, f"Queued {job} in batches of {settings.ADMIN_BULK_ACTION_BATCH_SIZE}. "
+                                   f"Progress is shown under Bulk action jobs.")
+    mark_price_zero.short_description = 'Set selected prices to 0 (in the background)'
 
     def preview_image(self, obj):
         return format_html('<img src="{}" width="60" />', obj.image_url)
+
+
+@admin.register(CrawlTarget)
+class CrawlTargetAdmin(admin.ModelAdmin):
+    list_display = ('category', 'page', 'change_rate', 'interval_minutes', 'next_crawl_at', 'last_crawled_at')
+    list_filter = ('category',)
+    ordering = ('next_crawl_at',)
+    readonly_fields = ('change_rate', 'last_crawled_at')
+
+
+@admin.register(BulkActionJob)
+class BulkActionJobAdmin(admin.ModelAdmin):
+    list_display = ('action', 'get_progress', 'processed', 'total', 'created_at', 'finished_at')
+    readonly_fields = ('action', 'total', 'processed', 'created_at', 'finished_at')
+
+    def get_progress(self, obj):
+        return obj.get_progress()
+    get_progress.short_description = 'Progress'
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,130 @@
+"""
+Pub/sub channel for live price-change events.
+
+The scraper publishes every change once it is committed to price_history
+(see ``tasks.publish_price_log``) and the SSE endpoint in views.py streams
+them to browsers. Two backends are available, picked by
+settings.PRICE_EVENTS_BACKEND:
+
+- ``memory``: an in-process ring buffer. Only useful when the scraper runs in
+  the same process as the web server (dev, tests).
+- ``redis``: a capped Redis stream, shared between the Celery worker and the
+  web tier. Stream entry IDs double as SSE event IDs, so reconnecting clients
+  resume from ``Last-Event-ID``.
+"""
+import collections
+import itertools
+import json
+import logging
+import math
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _json_safe(value):
+    # The CSV log records 'inf' for changes from a zero price; JSON has no Infinity.
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class MemoryChannel:
+    """In-process ring buffer with monotonically increasing integer event IDs."""
+
+    def __init__(self, max_backlog):
+        self._events = collections.deque(maxlen=max_backlog)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, payload):
+        with self._lock:
+            event_id = str(next(self._ids))
+            self._events.append((event_id, payload))
+        return event_id
+
+    def last_id(self):
+        with self._lock:
+            return self._events[-1][0] if self._events else '0'
+
+    def read_since(self, last_event_id):
+        try:
+            last = int(last_event_id)
+        except (TypeError, ValueError):
+            return []
+        with self._lock:
+            return [(event_id, payload) for event_id, payload in self._events if int(event_id) > last]
+
+
+class RedisChannel:
+    """Capped Redis stream; entry IDs are used as event IDs."""
+
+    def __init__(self, url, stream, max_backlog):
+        import redis
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._stream = stream
+        self._max_backlog = max_backlog
+
+    def publish(self, payload):
+        return self._client.xadd(
+            self._stream, {'data': json.dumps(payload)}, maxlen=self._max_backlog, approximate=True
+        )
+
+    def last_id(self):
+        entries = self._client.xrevrange(self._stream, count=1)
+        return entries[0][0] if entries else '0-0'
+
+    def read_since(self, last_event_id):
+        try:
+            entries = self._client.xrange(self._stream, min=f'({last_event_id}')
+        except Exception as e:
+            logger.warning(f"Could not read price events after '{last_event_id}': {e}")
+            return []
+        return [(entry_id, json.loads(fields['data'])) for entry_id, fields in entries]
+
+
+_channel = None
+_channel_lock = threading.Lock()
+
+
+def get_channel():
+    """Returns the process-wide channel configured in settings."""
+    global _channel
+    with _channel_lock:
+        if _channel is None:
+            if settings.PRICE_EVENTS_BACKEND == 'redis':
+                _channel = RedisChannel(
+                    settings.PRICE_EVENTS_REDIS_URL, settings.PRICE_EVENTS_STREAM, settings.PRICE_EVENTS_MAX_BACKLOG
+                )
+            else:
+                _channel = MemoryChannel(settings.PRICE_EVENTS_MAX_BACKLOG)
+        return _channel
+
+
+def reset_channel():
+    """Drops the cached channel so the next get_channel() re-reads settings."""
+    global _channel
+    with _channel_lock:
+        _channel = None
+
+
+def last_event_id():
+    """ID of the newest published event, or None if the channel is unavailable."""
+    try:
+        return get_channel().last_id()
+    except Exception as e:
+        logger.warning(f"Could not read the last price event ID: {e}")
+        return None
+
+
+def publish_price_change(change_details):
+    """Publishes a price change row; never lets a pub/sub outage break the scrape."""
+    payload = {key: _json_safe(value) for key, value in change_details.items()}
+    try:
+        return get_channel().publish(payload)
+    except Exception as e:
+        logger.warning(f"Could not publish price change for {change_details.get('product_url')}: {e}")
+        return None
@@ -0,0 +1,198 @@
+"""
+Tiered price-change history.
+
+Hot tier: the ``price_history`` table in the scraper's SQLite database, written
+in the same transaction as the product upsert. price_changes.csv is the public
+export of this hot range, rewritten from the table after every run that
+changes it (see ``tasks.publish_price_log``).
+
+Cold tier: rows older than ``settings.PRICE_HISTORY_HOT_DAYS`` are moved by
+``archive_cold_history`` into zstd-compressed Parquet files partitioned by month::
+
+    <PRICE_HISTORY_ARCHIVE_DIR>/month=2025-05/part-20250610040000.parquet
+
+``iter_price_history`` reads both tiers transparently, skipping month
+partitions outside the requested date range.
+"""
+import csv
+import datetime
+import logging
+import os
+import sqlite3
+
+import pyarrow
+import pyarrow.parquet as parquet
+
+logger = logging.getLogger(__name__)
+
+PRICE_LOG_FIELDNAMES = ['timestamp', 'product_id', 'product_name',
+                        'old_price_ars', 'new_price_ars', 'change_percentage', 'product_url']
+FLOAT_FIELDS = ('old_price_ars', 'new_price_ars', 'change_percentage')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+PARTITION_PREFIX = 'month='
+
+
+def _archive_schema():
+    return pyarrow.schema([
+        ('timestamp', pyarrow.string()),
+        ('product_id', pyarrow.string()),
+        ('product_name', pyarrow.string()),
+        ('old_price_ars', pyarrow.float64()),
+        ('new_price_ars', pyarrow.float64()),
+        ('change_percentage', pyarrow.float64()),
+        ('product_url', pyarrow.string()),
+    ])
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def setup_history_table(cursor):
+    """Creates the hot price_history table if needed."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS price_history (
+        timestamp TEXT NOT NULL,
+        product_id TEXT,
+        product_name TEXT,
+        old_price_ars REAL,
+        new_price_ars REAL,
+        change_percentage REAL,
+        product_url TEXT
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS price_history_timestamp ON price_history (timestamp)")
+
+
+def insert_changes(cursor, changes):
+    """Inserts price change dicts (same keys as the CSV log) into the hot tier."""
+    cursor.executemany(
+        f"INSERT INTO price_history ({', '.join(PRICE_LOG_FIELDNAMES)}) VALUES ({', '.join('?' * len(PRICE_LOG_FIELDNAMES))})",
+        [tuple(change[field] for field in PRICE_LOG_FIELDNAMES) for change in changes]
+    )
+
+
+def backfill_from_csv(conn, price_log_file_path):
+    """One-off import of an existing price_changes.csv into an empty hot tier."""
+    cursor = conn.cursor()
+    if cursor.execute("SELECT 1 FROM price_history LIMIT 1").fetchone():
+        return 0
+    if not os.path.isfile(price_log_file_path):
+        return 0
+    with open(price_log_file_path, newline='', encoding='utf-8') as csvfile:
+        changes = [
+            {field: (_to_float(row.get(field)) if field in FLOAT_FIELDS else row.get(field))
+             for field in PRICE_LOG_FIELDNAMES}
+            for row in csv.DictReader(csvfile)
+        ]
+    insert_changes(cursor, changes)
+    conn.commit()
+    logger.info(f"Backfilled {len(changes)} price changes from {price_log_file_path} into price_history.")
+    return len(changes)
+
+
+def export_hot_csv(conn, price_log_file_path):
+    """Rewrites price_changes.csv from the hot tier."""
+    tmp_path = f"{price_log_file_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(PRICE_LOG_FIELDNAMES)
+        writer.writerows(conn.execute(
+            f"SELECT {', '.join(PRICE_LOG_FIELDNAMES)} FROM price_history ORDER BY timestamp"
+        ))
+    os.replace(tmp_path, price_log_file_path)
+
+
+def archive_cold_history(conn, archive_dir, older_than_days, now=None):
+    """Moves hot rows older than ``older_than_days`` into monthly Parquet partitions.
+
+    Returns the number of rows archived. Partition files are written before the
+    rows are deleted, so a crash in between leaves duplicates rather than gaps.
+    """
+    now = now or datetime.datetime.now()
+    cutoff = (now - datetime.timedelta(days=older_than_days)).strftime(TIMESTAMP_FORMAT)
+    run_stamp = now.strftime('%Y%m%d%H%M%S')
+
+    cursor = conn.cursor()
+    months = [row[0] for row in cursor.execute(
+        "SELECT DISTINCT substr(timestamp, 1, 7) FROM price_history WHERE timestamp < ? ORDER BY 1", (cutoff,)
+    )]
+    archived = 0
+    for month in months:
+        rows = cursor.execute(
+            f"SELECT {', '.join(PRICE_LOG_FIELDNAMES)} FROM price_history "
+            "WHERE timestamp < ? AND substr(timestamp, 1, 7) = ? ORDER BY timestamp",
+            (cutoff, month)
+        ).fetchall()
+        table = pyarrow.Table.from_pylist([dict(zip(PRICE_LOG_FIELDNAMES, row)) for row in rows], schema=_archive_schema())
+        partition_dir = os.path.join(archive_dir, f"{PARTITION_PREFIX}{month}")
+        os.makedirs(partition_dir, exist_ok=True)
+        parquet.write_table(table, os.path.join(partition_dir, f"part-{run_stamp}.parquet"), compression='zstd')
+        archived += len(rows)
+        logger.info(f"Archived {len(rows)} price changes for {month} into {partition_dir}")
+
+    cursor.execute("DELETE FROM price_history WHERE timestamp < ?", (cutoff,))
+    conn.commit()
+    return archived
+
+
+def _archived_months(archive_dir):
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        name[len(PARTITION_PREFIX):] for name in os.listdir(archive_dir)
+        if name.startswith(PARTITION_PREFIX)
+    )
+
+
+def iter_price_history(conn, archive_dir, start=None, end=None):
+    """Yields price change dicts from both tiers, oldest first.
+
+    ``start``/``end`` are inclusive/exclusive timestamp strings in the CSV
+    format (a date prefix such as ``'2025-05'`` also works). Archived months
+    outside the range are never opened.
+    """
+    filters = []
+    if start:
+        filters.append(('timestamp', '>=', start))
+    if end:
+        filters.append(('timestamp', '<', end))
+
+    for month in _archived_months(archive_dir):
+        if (start and month < start[:7]) or (end and month > end[:7]):
+            continue
+        table = parquet.read_table(os.path.join(archive_dir, f"{PARTITION_PREFIX}{month}"),
+                                   filters=filters or None, schema=_archive_schema())
+        yield from table.sort_by('timestamp').to_pylist()
+
+    clauses, params = [], []
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    try:
+        rows = conn.execute(
+            f"SELECT {', '.join(PRICE_LOG_FIELDNAMES)} FROM price_history {where} ORDER BY timestamp", params
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read hot price history: {e}")
+        return
+    for row in rows:
+        yield dict(zip(PRICE_LOG_FIELDNAMES, row))
+
+
+def write_csv(rows, out):
+    """Writes price change dicts to a file object in the price_changes.csv layout."""
+    writer = csv.DictWriter(out, fieldnames=PRICE_LOG_FIELDNAMES)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
@@ -0,0 +1,177 @@
+"""
+HTTP caching keyed on the last completed scrape run.
+
+Prices only change when a scrape run finishes, so every cacheable response is
+versioned by the run recorded in the scrape manifest. At the end of
+a run the scraper calls ``record_scrape_run``, which compresses the data
+payloads once (brotli and gzip) and bumps the version. Views use the helpers
+here to answer conditional GETs with 304s and to serve the precompressed files.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from functools import wraps
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.path.join(settings.BASE_DIR, "scrape_manifest.json")
+
+# Preferred first when the client accepts several encodings.
+ENCODING_SUFFIXES = (
+    ('br', '.br'),
+    ('gzip', '.gz'),
+)
+
+_manifest_cache = {'mtime': None, 'run': None}
+
+
+def _write_atomically(path, write):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as fh:
+            write(fh)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def precompress(path):
+    """Writes ``path.gz`` and ``path.br`` next to ``path``."""
+    if not os.path.isfile(path):
+        return
+
+    def write_gzip(fh):
+        with open(path, 'rb') as src, gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst)
+
+    _write_atomically(path + '.gz', write_gzip)
+
+    with open(path, 'rb') as src:
+        compressed = brotli.compress(src.read(), quality=11)
+    _write_atomically(path + '.br', lambda fh: fh.write(compressed))
+
+
+def install_snapshot(snapshot_path, path):
+    """Moves ``snapshot_path`` and its precompressed variants over ``path`` and its variants.
+
+    Each file is swapped atomically; a variant the snapshot lacks is removed
+    rather than left serving older data.
+    """
+    for suffix in ('', *(suffix for _, suffix in ENCODING_SUFFIXES)):
+        if os.path.isfile(snapshot_path + suffix):
+            os.replace(snapshot_path + suffix, path + suffix)
+        elif suffix and os.path.isfile(path + suffix):
+            os.remove(path + suffix)
+
+
+def record_scrape_run(data_paths, manifest_path=None, last_event_id=None, snapshot_ns=None):
+    """Precompresses the data payloads and publishes a new scrape version.
+
+    ``last_event_id`` is the newest live-feed event already contained in the
+    payloads, so clients can subscribe to the feed from exactly that point.
+    ``snapshot_ns`` records when those payloads were exported, so an older
+    export can tell it must not replace them (see ``tasks.publish_price_log``).
+    """
+    manifest_path = manifest_path or MANIFEST_PATH
+    for path in data_paths:
+        try:
+            precompress(path)
+        except OSError as e:
+            logger.error(f"Failed to precompress {path}: {e}", exc_info=True)
+
+    completed_at = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    run = {
+        'version': f"{completed_at:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+        'completed_at': completed_at.isoformat(),
+    }
+    if last_event_id is not None:
+        run['last_event_id'] = last_event_id
+    if snapshot_ns is not None:
+        run['snapshot_ns'] = snapshot_ns
+    _write_atomically(manifest_path, lambda fh: fh.write(json.dumps(run).encode('utf-8')))
+    logger.info(f"Recorded scrape run {run['version']} in {manifest_path}")
+    return run
+
+
+def current_scrape_run(manifest_path=None):
+    """Returns the last recorded run as ``{'version', 'completed_at'[, 'last_event_id', 'snapshot_ns']}`` or None."""
+    manifest_path = manifest_path or MANIFEST_PATH
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        return None
+    if _manifest_cache['mtime'] != (manifest_path, mtime):
+        try:
+            with open(manifest_path, encoding='utf-8') as fh:
+                run = json.load(fh)
+            run['completed_at'] = datetime.datetime.fromisoformat(run['completed_at'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read scrape manifest {manifest_path}: {e}")
+            return None
+        _manifest_cache.update(mtime=(manifest_path, mtime), run=run)
+    return _manifest_cache['run']
+
+
+def scrape_etag(*parts):
+    """Builds an ETag from the current scrape version plus response-specific parts."""
+    run = current_scrape_run()
+    if run is None:
+        return None
+    return hashlib.sha1(":".join([run['version'], *map(str, parts)]).encode('utf-8')).hexdigest()
+
+
+def scrape_last_modified(request, *args, **kwargs):
+    """``last_modified_func`` for ``django.views.decorators.http.condition``."""
+    run = current_scrape_run()
+    return run['completed_at'] if run else None
+
+
+def negotiate_encoding(request, path):
+    """Picks the best precompressed variant of ``path`` the client accepts."""
+    accepted = {
+        token.split(';')[0].strip().lower()
+        for token in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+
+def add_cache_headers(response):
+    """Sets proxy/CDN-friendly Cache-Control and Vary headers on a cacheable response."""
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.HTTP_CACHE_MAX_AGE,
+        stale_while_revalidate=settings.HTTP_CACHE_STALE_WHILE_REVALIDATE,
+    )
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cache_per_scrape(etag_func, last_modified_func=scrape_last_modified):
+    """Decorator: conditional-GET handling keyed on the scrape version, plus cache headers (also on 304s).
+
+    Pass ``last_modified_func=None`` for views whose content can change between
+    scrape runs; only their ETag then decides 304s.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return add_cache_headers(conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,120 @@
+"""
+Stable product identity keyed by Atomo's ``data-id-product``.
+
+Product slugs (and so URLs) change over time, but the site product ID does not.
+The scraper's SQLite database keeps:
+
+- ``product_catalog``: one row per real SKU, keyed by the integer product ID.
+- ``product_aliases``: every URL ever seen for a product ID.
+
+``ProductIndex`` holds both in memory for the diff stage, so each listing is
+matched to its previous price with integer-keyed dict lookups, and a renamed
+slug keeps its price history instead of showing up as a new product.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def setup_identity_tables(cursor):
+    """Creates the product_catalog and product_aliases tables if needed."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_catalog (
+        product_id INTEGER PRIMARY KEY,
+        url TEXT,
+        name TEXT,
+        price_ars REAL,
+        image_url TEXT,
+        scraped_at TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_aliases (
+        url TEXT PRIMARY KEY,
+        product_id INTEGER NOT NULL,
+        first_seen TEXT,
+        last_seen TEXT
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS product_aliases_product_id ON product_aliases (product_id)")
+
+
+def parse_product_id(raw_value):
+    """Returns the site product ID as an int, or None if missing/invalid."""
+    try:
+        return int(raw_value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ProductIndex:
+    """In-memory identity index used by the diff stage.
+
+    ``prices`` maps product ID -> last price and ``urls`` product ID -> current
+    URL (both from product_catalog); ``aliases`` maps every known URL -> product
+    ID. ``legacy_prices`` is the old URL-keyed ``products`` table, consulted
+    only for products that have not been seen with an ID yet.
+    """
+
+    def __init__(self, prices=None, urls=None, aliases=None, legacy_prices=None):
+        self.prices = prices or {}
+        self.urls = urls or {}
+        self.aliases = aliases or {}
+        self.legacy_prices = legacy_prices or {}
+
+    @classmethod
+    def load(cls, conn, legacy_prices=None):
+        index = cls(legacy_prices=legacy_prices)
+        for product_id, url, price in conn.execute("SELECT product_id, url, price_ars FROM product_catalog"):
+            index.prices[product_id] = price
+            index.urls[product_id] = url
+        index.aliases = dict(conn.execute("SELECT url, product_id FROM product_aliases"))
+        logger.info(f"Loaded identity index: {len(index.prices)} products, {len(index.aliases)} URL aliases.")
+        return index
+
+    def resolve(self, raw_product_id, url):
+        """Returns the stable product ID for a listing, falling back to known URL aliases."""
+        product_id = parse_product_id(raw_product_id)
+        if product_id is None:
+            product_id = self.aliases.get(url)
+        return product_id
+
+    def old_price(self, product_id, url):
+        """Last known price for a listing, by ID when possible."""
+        if product_id is not None and product_id in self.prices:
+            return self.prices[product_id]
+        return self.legacy_prices.get(url)
+
+    def observe(self, product_id, url, price):
+        """Records the listing just scraped; returns the previous URL if the slug changed.
+
+        Updating the price here means a product listed in several categories
+        is only reported as changed once per run.
+        """
+        previous_url = self.urls.get(product_id)
+        self.urls[product_id] = url
+        self.aliases[url] = product_id
+        if price is not None:
+            self.prices[product_id] = price
+        if previous_url and previous_url != url:
+            return previous_url
+        return None
+
+
+def save_products(cursor, catalog_rows, alias_rows):
+    """Upserts product_catalog rows and product_aliases (url, product_id, seen_at) rows.
+
+    URLs that now resolve to a product ID are dropped from the legacy
+    URL-keyed ``products`` table so it drains to ID-less listings only.
+    """
+    cursor.executemany('''
+    INSERT OR REPLACE INTO product_catalog
+    (product_id, url, name, price_ars, image_url, scraped_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', catalog_rows)
+    cursor.executemany('''
+    INSERT INTO product_aliases (url, product_id, first_seen, last_seen)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET product_id = excluded.product_id, last_seen = excluded.last_seen
+    ''', [(url, product_id, seen_at, seen_at) for url, product_id, seen_at in alias_rows])
+    cursor.executemany("DELETE FROM products WHERE url = ?", [(url,) for url, _, _ in alias_rows])
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from danimax.tasks import PRICE_HISTORY_ARCHIVE_DIR, archive_price_history
+
+
+class Command(BaseCommand):
+    help = "Moves price history older than N days from SQLite into month-partitioned Parquet files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.PRICE_HISTORY_HOT_DAYS,
+            help=f"Keep this many days in SQLite (default: {settings.PRICE_HISTORY_HOT_DAYS}).",
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_price_history(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} price changes into {PRICE_HISTORY_ARCHIVE_DIR}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from danimax import history
+from danimax.tasks import DB_PATH, PRICE_HISTORY_ARCHIVE_DIR, setup_database
+
+
+class Command(BaseCommand):
+    help = "Exports price history from both the SQLite hot tier and the Parquet archive as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Inclusive lower bound, e.g. 2025-01 or 2025-01-15.")
+        parser.add_argument('--end', help="Exclusive upper bound, e.g. 2025-07.")
+        parser.add_argument('--output', help="Output file (default: stdout).")
+
+    def handle(self, *args, **options):
+        conn, _ = setup_database(DB_PATH)
+        try:
+            rows = history.iter_price_history(conn, PRICE_HISTORY_ARCHIVE_DIR, start=options['start'], end=options['end'])
+            if options['output']:
+                with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                    count = history.write_csv(rows, out)
+            else:
+                count = history.write_csv(rows, self.stdout)
+        finally:
+            conn.close()
+        self.stderr.write(f"Exported {count} price changes.")
@@ -0,0 +1,112 @@
+import contextlib
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from danimax.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the web tier and reports throughput and p50/p95/p99 latency per endpoint. "
+        "Runs in-process through Django's test client (also reporting queries per request), "
+        "or against a running server with --base-url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--base-url', help="e.g. http://localhost:8000 (default: in-process).")
+        parser.add_argument('--admin-user', help="Also hit the Product admin changelist as this existing user (in-process only).")
+        parser.add_argument('--endpoints', default='index,detail,data,admin',
+                            help="Comma-separated subset of index, detail, data, admin.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        bounds = Product.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            raise CommandError("No products found; run seed_loadtest_data first.")
+        rng = random.Random(options['seed'])
+        rng_lock = threading.Lock()
+
+        def random_detail_path():
+            with rng_lock:
+                return f"/{rng.randint(bounds['low'], bounds['high'])}/"
+
+        endpoints = {
+            'index': lambda: "/",
+            'detail': random_detail_path,
+            'data': lambda: "/price_changes.csv",
+        }
+        admin_user = None
+        if options['admin_user']:
+            if options['base_url']:
+                raise CommandError("--admin-user is only supported in-process.")
+            admin_user = get_user_model().objects.get(username=options['admin_user'])
+            endpoints['admin'] = lambda: "/admin/danimax/product/"
+
+        selected = [name for name in options['endpoints'].split(',') if name in endpoints]
+        self.stdout.write(f"{'endpoint':<8} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for name in selected:
+            result = self.run_endpoint(endpoints[name], options, admin_user)
+            self.stdout.write(self.format_result(name, result))
+
+    def make_client(self, options, admin_user):
+        if options['base_url']:
+            return httpx.Client(base_url=options['base_url'], headers={'Accept-Encoding': 'gzip, br'})
+        client = Client(SERVER_NAME='localhost', HTTP_ACCEPT_ENCODING='gzip, br')
+        if admin_user:
+            client.force_login(admin_user)
+        return client
+
+    def run_endpoint(self, path_func, options, admin_user):
+        local = threading.local()
+        in_process = not options['base_url']
+
+        def one_request(_):
+            if not hasattr(local, 'client'):
+                local.client = self.make_client(options, admin_user)
+            path = path_func()
+            with contextlib.ExitStack() as stack:
+                # Views read through the read-only alias, so count queries on every connection.
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                started = time.perf_counter()
+                response = local.client.get(path)
+                if in_process and getattr(response, 'streaming', False):
+                    b"".join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            query_count = sum(len(queries) for queries in captured) if in_process else None
+            return elapsed, response.status_code < 400, query_count
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            samples = list(pool.map(one_request, range(options['requests'])))
+        wall_time = time.perf_counter() - started
+
+        latencies = sorted(elapsed for elapsed, _, _ in samples)
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+        query_counts = [count for _, _, count in samples if count is not None]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for _, ok, _ in samples if not ok),
+            'throughput': len(samples) / wall_time if wall_time else 0.0,
+            'p50': cuts[49] * 1000,
+            'p95': cuts[94] * 1000,
+            'p99': cuts[98] * 1000,
+            'queries': statistics.mean(query_counts) if query_counts else None,
+        }
+
+    def format_result(self, name, result):
+        queries = f"{result['queries']:.1f}" if result['queries'] is not None else "-"
+        return (f"{name:<8} {result['requests']:>6} {result['errors']:>6} {result['throughput']:>8.1f} "
+                f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} {queries:>8}")
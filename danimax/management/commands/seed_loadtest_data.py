@@ -0,0 +1,125 @@
+import datetime
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from danimax import history, http_cache, scheduler
+from danimax.models import Product
+from danimax.tasks import CATEGORIES, DB_PATH, PRICE_LOG_PATH, setup_database
+
+WORDS = ['Yerba', 'Mate', 'Dulce de Leche', 'Galletitas', 'Fideos', 'Arroz', 'Aceite', 'Harina', 'Azucar', 'Cafe',
+         'Leche', 'Queso', 'Jabon', 'Shampoo', 'Detergente', 'Gaseosa', 'Vino', 'Cerveza', 'Pañales', 'Alimento Perro']
+BRANDS = ['Taragui', 'La Serenisima', 'Marolio', 'Arcor', 'Bagley', 'Matarazzo', 'Gallo', 'Natura', 'Ledesma', 'Quilmes']
+SIZES = ['500g', '1kg', '1.5L', '2.25L', '750ml', '6u', '30u', '400g']
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic catalogue (Products) and price-change history for load testing. "
+        "Run it against a throwaway database, never production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000,
+                            help="Products to add to the default database. Needs DEBUG or --allow-live-db.")
+        parser.add_argument('--allow-live-db', action='store_true',
+                            help="Allow adding products to the default database, which serves the site, with DEBUG off.")
+        parser.add_argument('--changes', type=int, default=0,
+                            help="Price changes to add to the scraper's price_history table (e.g. 2000000).")
+        parser.add_argument('--history-db',
+                            help=f"Scratch SQLite database for the price changes (required with --changes; the live one is {DB_PATH}).")
+        parser.add_argument('--export-csv', action='store_true',
+                            help=f"Rewrite {PRICE_LOG_PATH} from the seeded history so /price_changes.csv has data. "
+                                 "Needs DEBUG or --allow-live-csv.")
+        parser.add_argument('--allow-live-csv', action='store_true',
+                            help="Allow --export-csv to overwrite the served CSV and bump the scrape version with DEBUG off.")
+        parser.add_argument('--days', type=int, default=365, help="Spread scrape dates over this many days.")
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("seed_loadtest_data only supports the SQLite backend.")
+        if options['products'] and not (settings.DEBUG or options['allow_live_db']):
+            raise CommandError(f"Seeding adds {options['products']} fake products to {connection.settings_dict['NAME']}, "
+                               "which serves the site; run with DEBUG on or pass --allow-live-db.")
+        if options['changes'] and not options['history_db']:
+            raise CommandError("--changes needs an explicit --history-db (use a scratch file, not the live scraper database).")
+        if options['export_csv'] and not (settings.DEBUG or options['allow_live_csv']):
+            raise CommandError(f"--export-csv overwrites {PRICE_LOG_PATH} and publishes a new scrape version; "
+                               "run with DEBUG on or pass --allow-live-csv.")
+        rng = random.Random(options['seed'])
+        self.seed_products(rng, options['products'], options['days'], options['batch_size'])
+        if options['changes']:
+            self.seed_history(rng, options['changes'], options['products'], options['days'],
+                              options['history_db'], options['batch_size'], options['export_csv'])
+
+    def product_name(self, rng):
+        return f"{rng.choice(WORDS)} {rng.choice(BRANDS)} {rng.choice(SIZES)}"
+
+    def product_url(self, site_product_id):
+        category = scheduler.category_name(CATEGORIES[site_product_id % len(CATEGORIES)][0])
+        return f"https://atomoconviene.com/atomo-ecommerce/{category}/{site_product_id}-loadtest.html"
+
+    def seed_products(self, rng, total, days, batch_size):
+        # Synthetic site IDs continue after the last product so reruns add new URLs.
+        start_id = (Product.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        first_pk = None
+        for offset in range(0, total, batch_size):
+            batch = []
+            for site_product_id in range(start_id + offset, start_id + min(offset + batch_size, total)):
+                batch.append(Product(
+                    url=self.product_url(site_product_id),
+                    name=self.product_name(rng),
+                    price_ars=round(rng.lognormvariate(8, 1), 2),
+                    image_url=f"https://atomoconviene.com/img/p/{site_product_id}.jpg",
+                ))
+            with transaction.atomic():
+                created = Product.objects.bulk_create(batch)
+            first_pk = first_pk or created[0].pk
+            self.stdout.write(f"Products: {offset + len(batch)}/{total}")
+
+        if first_pk is None:
+            return
+        # scraped_at is auto_now_add, so bulk_create stamps every row with "now";
+        # spread the dates out so date filters and ordering see a realistic distribution.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE danimax_product SET scraped_at = datetime(scraped_at, '-' || (abs(random()) %% %s) || ' minutes') "
+                "WHERE id >= %s",
+                [days * 24 * 60, first_pk]
+            )
+        self.stdout.write(self.style.SUCCESS(f"Seeded {total} products."))
+
+    def seed_history(self, rng, total, products, days, history_db, batch_size, export_csv):
+        conn, cursor = setup_database(history_db)
+        now = datetime.datetime.now()
+        try:
+            for offset in range(0, total, batch_size):
+                changes = []
+                for _ in range(min(batch_size, total - offset)):
+                    site_product_id = rng.randint(1, max(products, 1))
+                    old_price = round(rng.lognormvariate(8, 1), 2)
+                    change_percentage = round(rng.gauss(4, 6), 2)
+                    changes.append({
+                        'timestamp': (now - datetime.timedelta(minutes=rng.randrange(days * 24 * 60))).strftime(history.TIMESTAMP_FORMAT),
+                        'product_id': site_product_id,
+                        'product_name': self.product_name(rng),
+                        'old_price_ars': old_price,
+                        'new_price_ars': round(old_price * (1 + change_percentage / 100), 2),
+                        'change_percentage': change_percentage,
+                        'product_url': self.product_url(site_product_id),
+                    })
+                history.insert_changes(cursor, changes)
+                conn.commit()
+                self.stdout.write(f"Price changes: {offset + len(changes)}/{total}")
+            if export_csv:
+                history.export_hot_csv(conn, PRICE_LOG_PATH)
+                http_cache.record_scrape_run([PRICE_LOG_PATH])
+                self.stdout.write(f"Exported price history to {PRICE_LOG_PATH}")
+        finally:
+            conn.close()
+        self.stdout.write(self.style.SUCCESS(f"Seeded {total} price changes into {history_db}."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('danimax', '0002_alter_product_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='url',
+            field=models.URLField(max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('danimax', '0003_alter_product_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('page', models.PositiveIntegerField()),
+                ('url', models.URLField(max_length=255, unique=True)),
+                ('change_rate', models.FloatField(default=0.0)),
+                ('interval_minutes', models.PositiveIntegerField(default=720)),
+                ('next_crawl_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('last_crawled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Crawl target',
+                'verbose_name_plural': 'Crawl targets',
+                'ordering': ['next_crawl_at'],
+                'unique_together': {('category', 'page')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 14:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('danimax', '0005_product_scraped_idx_bulkactionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField(db_index=True)),
+                ('target', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='danimax.crawltarget')),
+            ],
+            options={
+                'verbose_name': 'Crawl request',
+                'verbose_name_plural': 'Crawl requests',
+                'ordering': ['-requested_at'],
+            },
+        ),
+    ]
@@ -1,13 +1,78 @@
+import datetime
+
 from django.db import models
+from django.utils import timezone
+
+
+def _period_start(value, kind):
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind == 'year':
+        return value.replace(month=1, day=1)
+    if kind == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return _period_start(start + datetime.timedelta(days=1), kind)
+
+
+class ProductQuerySet(models.QuerySet):
+    # Beyond this many candidate periods the per-period probes cost more than one scan.
+    MAX_PERIOD_PROBES = 62
+
+    def date_bounds(self, field_name):
+        """Returns the (first, last) values of field_name, or (None, None) if empty.
+
+        Two queries on purpose: SQLite answers a lone MIN() or MAX() with an
+        index search, but walks every row when both share one SELECT.
+        """
+        first = self.aggregate(value=models.Min(field_name))['value']
+        if first is None:
+            return None, None
+        return first, self.aggregate(value=models.Max(field_name))['value']
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        """Index-friendly datetimes() for year/month/day (used by the admin's date_hierarchy).
+
+        The stock implementation truncates every row with a Python SQLite function.
+        Here the min/max come from the index and each candidate period is
+        checked with one indexed range EXISTS query.
+        """
+        if kind not in ('year', 'month', 'day') or tzinfo is not None or self.query.is_sliced:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        first, last = self.date_bounds(field_name)
+        if first is None:
+            return []
+        if timezone.is_aware(first):
+            first, last = timezone.localtime(first), timezone.localtime(last)
+        periods = []
+        start = _period_start(first, kind)
+        while start <= last:
+            periods.append((start, _next_period(start, kind)))
+            if len(periods) > self.MAX_PERIOD_PROBES:
+                return super().datetimes(field_name, kind, order, tzinfo)
+            start = periods[-1][1]
+        result = [
+            start for start, end in periods
+            if self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}).exists()
+        ]
+        return result[::-1] if order == 'DESC' else result
+
 
-# Create your models here.
 class Product(models.Model):
-    url = models.URLField(max_length=100, unique=True)
+    url = models.URLField(max_length=255, unique=True)
     name = models.CharField(max_length=100)
     price_ars = models.FloatField()
     image_url = models.URLField(max_length=100)
     scraped_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} - {self.price_ars} ARS"
 
@@ -25,5 +90,73 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-scraped_at']
+        indexes = [
+            # Serves the admin's date_hierarchy and its (-scraped_at, -id) ordering / cursor paging.
+            models.Index(fields=['scraped_at', 'id'], name='danimax_product_scraped_idx'),
+        ]
         verbose_name = 'Product'
-        verbose_name_plural = 'Products'
\ No newline at end of file
+        verbose_name_plural = 'Products'
+
+class CrawlTarget(models.Model):
+    """One listing page the adaptive scheduler (danimax/scheduler.py) revisits."""
+    category = models.CharField(max_length=100)
+    page = models.PositiveIntegerField()
+    url = models.URLField(max_length=255, unique=True)
+    # Smoothed fraction of the page's listings that change price per hour.
+    change_rate = models.FloatField(default=0.0)
+    interval_minutes = models.PositiveIntegerField(default=720)
+    next_crawl_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_crawled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.category} p{self.page} (every {self.interval_minutes} min)"
+
+    def priority(self, at):
+        """Expected fraction of listings changed since the last crawl; higher is crawled first."""
+        if self.last_crawled_at is None:
+            return float('inf')
+        hours_since = (at - self.last_crawled_at).total_seconds() / 3600
+        return self.change_rate * hours_since
+
+    class Meta:
+        ordering = ['next_crawl_at']
+        unique_together = [('category', 'page')]
+        verbose_name = 'Crawl target'
+        verbose_name_plural = 'Crawl targets'
+
+
+class CrawlRequest(models.Model):
+    """One page request charged to the scraping budget (see scheduler.requests_per_tick)."""
+    target = models.ForeignKey(CrawlTarget, null=True, on_delete=models.SET_NULL, related_name='requests')
+    requested_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.target} at {self.requested_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['-requested_at']
+        verbose_name = 'Crawl request'
+        verbose_name_plural = 'Crawl requests'
+
+
+class BulkActionJob(models.Model):
+    """Progress of an admin bulk action running in the background (see ProductAdmin)."""
+    action = models.CharField(max_length=100)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.action} #{self.pk} ({self.get_progress()})"
+
+    def get_progress(self):
+        if not self.total:
+            # Not counted yet, or an empty selection.
+            return "100%" if self.finished_at else "0%"
+        return f"{min(self.processed, self.total) / self.total:.0%}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Bulk action job'
+        verbose_name_plural = 'Bulk action jobs'
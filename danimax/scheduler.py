@@ -0,0 +1,143 @@
+"""
+Adaptive, volatility-driven scraping schedule.
+
+Instead of re-crawling every category twice a day, each listing page is a
+``CrawlTarget`` with its own revisit interval:
+
+- After every crawl the page's change rate (fraction of listings whose price
+  changed, per hour) is smoothed with an EWMA, and the interval is set so that
+  roughly ``ADAPTIVE_SCRAPE_TARGET_CHANGE_FRACTION`` of its listings are
+  expected to change between visits, clamped to the min/max interval.
+- Beat runs the ``scrape_due_pages`` task every ``ADAPTIVE_SCRAPE_TICK_MINUTES``.
+  Each tick takes the due pages with the most expected missed changes first, so
+  volatile pages ("ofertas") stay fresh. Every request is logged as a
+  ``CrawlRequest``, and a tick only gets what is left of its own share, of the
+  hour's share and of ``ADAPTIVE_SCRAPE_DAILY_REQUEST_BUDGET`` over the last
+  24 hours, so requests are spread over the day and never exceed the budget.
+
+``AdaptiveScheduler`` is django_celery_beat's ``DatabaseScheduler`` plus the
+bookkeeping to switch over: it seeds crawl targets and disables the old fixed
+twice-daily entry that earlier deployments stored in the database.
+"""
+import datetime
+import logging
+import math
+
+from django.conf import settings
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask, PeriodicTasks
+from django_celery_beat.schedulers import DatabaseScheduler
+
+from danimax.models import CrawlRequest, CrawlTarget
+
+logger = logging.getLogger(__name__)
+
+LEGACY_FULL_CRAWL_ENTRY = 'scrape-atomo-every-12-hours'
+
+
+def category_name(base_url_template):
+    return base_url_template.split('/')[-1].split('?')[0]
+
+
+def sync_crawl_targets(categories):
+    """Creates a CrawlTarget (due immediately) for every page of every category."""
+    created = 0
+    for base_url_template, max_pages in categories:
+        for page_num in range(1, max_pages + 1):
+            _, was_created = CrawlTarget.objects.get_or_create(
+                url=base_url_template.format(page_num),
+                defaults={
+                    'category': category_name(base_url_template),
+                    'page': page_num,
+                    'next_crawl_at': timezone.now(),
+                },
+            )
+            created += was_created
+    if created:
+        logger.info(f"Added {created} crawl targets for the adaptive scheduler.")
+    return created
+
+
+def requests_per_tick(now):
+    """How many pages this tick may fetch without overrunning the daily request budget.
+
+    A tick gets at most its rounded-up share of the budget, the hour at most its
+    rounded-up share, and nothing once the last 24 hours used the whole budget.
+    """
+    budget = settings.ADAPTIVE_SCRAPE_DAILY_REQUEST_BUDGET
+    ticks_per_day = 24 * 60 / settings.ADAPTIVE_SCRAPE_TICK_MINUTES
+    recent = CrawlRequest.objects.filter(requested_at__lte=now)
+    used_last_hour = recent.filter(requested_at__gt=now - datetime.timedelta(hours=1)).count()
+    used_last_day = recent.filter(requested_at__gt=now - datetime.timedelta(days=1)).count()
+    return max(0, min(
+        math.ceil(budget / ticks_per_day),
+        math.ceil(budget / 24) - used_last_hour,
+        budget - used_last_day,
+    ))
+
+
+def charge_requests(targets, at):
+    """Logs one request per target against the budget and drops entries older than a day."""
+    CrawlRequest.objects.bulk_create([CrawlRequest(target=target, requested_at=at) for target in targets])
+    CrawlRequest.objects.filter(requested_at__lte=at - datetime.timedelta(days=1)).delete()
+
+
+def due_targets(now, limit):
+    """Due targets, most expected missed changes first, capped at ``limit``."""
+    due = CrawlTarget.objects.filter(next_crawl_at__lte=now)
+    return sorted(due, key=lambda target: (-target.priority(now), target.next_crawl_at))[:limit]
+
+
+def interval_for_rate(change_rate):
+    """Revisit interval (minutes) so ~TARGET_CHANGE_FRACTION of listings change between visits."""
+    min_minutes = settings.ADAPTIVE_SCRAPE_MIN_INTERVAL_HOURS * 60
+    max_minutes = settings.ADAPTIVE_SCRAPE_MAX_INTERVAL_HOURS * 60
+    if change_rate <= 0:
+        return max_minutes
+    minutes = settings.ADAPTIVE_SCRAPE_TARGET_CHANGE_FRACTION / change_rate * 60
+    return int(min(max_minutes, max(min_minutes, minutes)))
+
+
+def record_crawl(target, listings, changes, now):
+    """Updates a target's change rate, interval and next due time after a crawl.
+
+    ``listings=None`` means the page could not be fetched: only the next due time moves.
+    """
+    if listings:
+        if target.last_crawled_at is None:
+            hours_since = settings.ADAPTIVE_SCRAPE_MAX_INTERVAL_HOURS
+        else:
+            hours_since = max((now - target.last_crawled_at).total_seconds() / 3600, 1 / 60)
+        observed_rate = changes / listings / hours_since
+        alpha = settings.ADAPTIVE_SCRAPE_SMOOTHING
+        target.change_rate = alpha * observed_rate + (1 - alpha) * target.change_rate
+        target.interval_minutes = interval_for_rate(target.change_rate)
+    elif listings == 0:
+        # Page past the end of the category (or empty): check back rarely.
+        target.interval_minutes = settings.ADAPTIVE_SCRAPE_MAX_INTERVAL_HOURS * 60
+    if listings is not None:
+        target.last_crawled_at = now
+    target.next_crawl_at = now + datetime.timedelta(minutes=target.interval_minutes)
+    target.save(update_fields=['change_rate', 'interval_minutes', 'last_crawled_at', 'next_crawl_at'])
+
+
+def record_crawls(page_stats, now):
+    """Applies ``{page_url: {'listings': n, 'changes': k}}`` from a scrape to the matching targets."""
+    for target in CrawlTarget.objects.filter(url__in=list(page_stats)):
+        stats = page_stats[target.url]
+        record_crawl(target, stats['listings'], stats['changes'], now)
+
+
+class AdaptiveScheduler(DatabaseScheduler):
+    """DatabaseScheduler that also prepares the adaptive crawl schedule on startup."""
+
+    def install_default_entries(self, data):
+        super().install_default_entries(data)
+        from danimax.tasks import CATEGORIES
+
+        sync_crawl_targets(CATEGORIES)
+        data.pop(LEGACY_FULL_CRAWL_ENTRY, None)
+        disabled = PeriodicTask.objects.filter(name=LEGACY_FULL_CRAWL_ENTRY, enabled=True).update(enabled=False)
+        if disabled:
+            PeriodicTasks.update_changed()
+            logger.info(f"Disabled legacy beat entry '{LEGACY_FULL_CRAWL_ENTRY}' in favour of adaptive scraping.")
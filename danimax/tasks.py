@@ -2,6 +2,9 @@
 
 from celery import shared_task
 from django.conf import settings  # To get BASE_DIR for absolute paths
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 
 import httpx
 from lxml import html
@@ -10,15 +13,21 @@ import time
 import logging
 import re
 import datetime
+import itertools
 import pytz
 import os
-import csv
+import uuid
+
+from dani import storage
+from danimax import events, history, http_cache, identity, scheduler
+from danimax.models import BulkActionJob, CrawlTarget, Product
 
 # --- Configuration ---
 # Construct absolute paths using Django's settings.BASE_DIR
 # Assumes your DB and log file are in the Django project's root directory
 DB_PATH = os.path.join(settings.BASE_DIR, "atomo_django.db")
 PRICE_LOG_PATH = os.path.join(settings.BASE_DIR, "price_changes.csv")
+PRICE_HISTORY_ARCHIVE_DIR = str(settings.PRICE_HISTORY_ARCHIVE_DIR)
 
 REQUEST_TIMEOUT = 25.0
 SLEEP_BETWEEN_PAGES = 1.0
@@ -113,9 +122,9 @@ def get_argentina_time_str():
 
 # --- Database and History Setup ---
 def setup_database(db_file_path):
-    """Connects to the SQLite database and ensures the table exists."""
+    """Connects to the SQLite database (tuned via settings.SQLITE_PRAGMAS) and ensures the table exists."""
     try:
-        conn = sqlite3.connect(db_file_path)
+        conn = storage.connect(db_file_path, settings.SQLITE_PRAGMAS)
         cursor = conn.cursor()
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS products (
@@ -126,6 +135,8 @@ def setup_database(db_file_path):
             scraped_at TEXT
         )
         ''')
+        identity.setup_identity_tables(cursor)
+        history.setup_history_table(cursor)
         conn.commit()
         logger.info(f"Database connection established/verified at {db_file_path}")
         return conn, cursor
@@ -149,44 +160,38 @@ def load_old_prices(conn):
     return old_prices
 
 
-def log_price_change(price_log_file_path, change_details):
-    """Appends a price change event to the CSV log file."""
-    file_exists = os.path.isfile(price_log_file_path)
-    try:
-        with open(price_log_file_path, 'a', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['timestamp', 'product_id', 'product_name',
-                          'old_price_ars', 'new_price_ars', 'change_percentage', 'product_url']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            if not file_exists or os.path.getsize(price_log_file_path) == 0:
-                writer.writeheader()
-
-            writer.writerow(change_details)
-    except IOError as e:
-        logger.error(f"Failed to write to price change log {price_log_file_path}: {e}", exc_info=True)
-
-
 # --- Main Scraping Logic ---
-def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, current_price_log_path):
-    """Scrapes product data, compares prices, logs changes, and prepares data for DB update."""
+def scrape_products_data(conn, cursor, categories_to_scrape, product_index, page_stats=None, recorded_changes=None):
+    """Scrapes product data, compares prices (by site product ID via product_index), records changes in price_history, and updates the DB.
+
+    categories_to_scrape holds (url_template, max_pages) or (url_template, [page numbers]) pairs.
+    If page_stats is given, it is filled with {page_url: {'listings': n, 'changes': k}}.
+    If recorded_changes is given, the changes committed to price_history are appended to it.
+    """
     all_products_for_db = []
+    catalog_rows_for_db = {}
+    alias_rows_for_db = []
+    detected_changes = []
     price_change_detected_flag = False
     total_processed_pages = 0
     total_products_found_listings = 0
 
     with httpx.Client(headers=HEADERS, timeout=REQUEST_TIMEOUT, follow_redirects=True) as client:
         for base_url_template, max_pages in categories_to_scrape:
-            category_name = base_url_template.split('/')[-1].split('?')[0]
-            logger.info(f"--- Starting category: {category_name} (Max pages: {max_pages}) ---")
+            category_name = scheduler.category_name(base_url_template)
+            pages = range(1, max_pages + 1) if isinstance(max_pages, int) else max_pages
+            logger.info(f"--- Starting category: {category_name} (Pages: {max_pages}) ---")
             category_products_found_on_page = 0
 
-            for page_num in range(1, max_pages + 1):
+            for page_num in pages:
                 current_page_url = base_url_template.format(page_num)
                 logger.info(f"Attempting to scrape page: {current_page_url}")
                 try:
                     response = client.get(current_page_url)
                     if response.status_code == 404:
                         logger.warning(f"Page {current_page_url} returned 404, stopping for this category.")
+                        if page_stats is not None:
+                            page_stats[current_page_url] = {'listings': 0, 'changes': 0}
                         break
                     response.raise_for_status()
                 except Exception as list_err:
@@ -200,6 +205,8 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
                     if not product_elements:
                         logger.info(
                             f"No products found on page {page_num} for {category_name}. Moving to next or finishing category.")
+                        if page_stats is not None:
+                            page_stats[current_page_url] = {'listings': 0, 'changes': 0}
                         break
 
                     total_processed_pages += 1
@@ -208,6 +215,7 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
                     logger.info(f"Found {page_products_count} products on page {page_num} of {category_name}...")
 
                     current_scraped_at_ts = get_argentina_time_str()
+                    page_changes_count = 0
 
                     for product_el in product_elements:
                         product_data = {}
@@ -227,12 +235,13 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
                                 f"Skipping product on page {page_num} due to missing PRODUCT_URL. Site Product ID: {product_id_from_site}. Page URL: {current_page_url}")
                             continue
 
-                        if not product_id_from_site:
+                        stable_product_id = product_index.resolve(product_id_from_site, product_url)
+                        if stable_product_id is None:
                             logger.warning(
-                                f"Product with URL {product_url} is missing PRODUCT_ID (data-id-product). Price change log might be affected if this ID is primary for it.")
+                                f"Product with URL {product_url} is missing PRODUCT_ID (data-id-product) and has no known alias. Falling back to URL-keyed tracking.")
 
                         new_price_ars = clean_price(product_data.get("PRODUCT_PRICE_STR"))
-                        old_price_ars = old_prices_dict.get(product_url)
+                        old_price_ars = product_index.old_price(stable_product_id, product_url)
 
                         is_change = False
                         percentage_change = 0.0
@@ -256,16 +265,17 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
 
                         if is_change:
                             price_change_detected_flag = True
+                            page_changes_count += 1
                             change_details = {
                                 'timestamp': current_scraped_at_ts,
-                                'product_id': product_id_from_site or "N/A",
+                                'product_id': stable_product_id or "N/A",
                                 'product_name': product_name or "N/A",
                                 'old_price_ars': old_price_ars,
                                 'new_price_ars': new_price_ars,
                                 'change_percentage': percentage_change,
                                 'product_url': product_url
                             }
-                            log_price_change(current_price_log_path, change_details)
+                            detected_changes.append(change_details)
                             logger.info(
                                 f"PRICE CHANGE: URL {product_url} (SiteID: {product_id_from_site}) | Old: {old_price_ars} | New: {new_price_ars} | %: {percentage_change}%")
 
@@ -276,9 +286,19 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
                             product_image_url,
                             current_scraped_at_ts
                         )
-                        all_products_for_db.append(product_tuple_for_db)
+                        if stable_product_id is None:
+                            all_products_for_db.append(product_tuple_for_db)
+                        else:
+                            previous_url = product_index.observe(stable_product_id, product_url, new_price_ars)
+                            if previous_url:
+                                logger.info(
+                                    f"URL change for SiteID {stable_product_id}: {previous_url} -> {product_url}")
+                            catalog_rows_for_db[stable_product_id] = (stable_product_id, *product_tuple_for_db)
+                            alias_rows_for_db.append((product_url, stable_product_id, current_scraped_at_ts))
                         total_products_found_listings += 1
 
+                    if page_stats is not None:
+                        page_stats[current_page_url] = {'listings': page_products_count, 'changes': page_changes_count}
                     time.sleep(SLEEP_BETWEEN_PAGES)
 
                 except html.LxmlError as e:
@@ -291,19 +311,23 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
             logger.info(
                 f"--- Finished category '{category_name}'. Found {category_products_found_on_page} product listings in this category run. ---")
 
-    if all_products_for_db:
+    if all_products_for_db or catalog_rows_for_db:
         logger.info(f"Processed {total_products_found_listings} product listings across {total_processed_pages} pages.")
         unique_products_to_insert = {item[0]: item for item in all_products_for_db}
         logger.info(
-            f"Attempting to insert/update {len(unique_products_to_insert)} unique product records into the database.")
+            f"Attempting to insert/update {len(catalog_rows_for_db)} products by site ID and {len(unique_products_to_insert)} URL-only product records into the database.")
         try:
             cursor.executemany('''
             INSERT OR REPLACE INTO products
             (url, name, price_ars, image_url, scraped_at)
             VALUES (?, ?, ?, ?, ?)
             ''', list(unique_products_to_insert.values()))
+            identity.save_products(cursor, list(catalog_rows_for_db.values()), alias_rows_for_db)
+            history.insert_changes(cursor, detected_changes)
             conn.commit()
-            cursor.execute("SELECT COUNT(*) FROM products")
+            if recorded_changes is not None:
+                recorded_changes.extend(detected_changes)
+            cursor.execute("SELECT (SELECT COUNT(*) FROM product_catalog) + (SELECT COUNT(*) FROM products)")
             final_db_count = cursor.fetchone()[0]
             logger.info(f"Database update complete. Final unique product count in DB: {final_db_count}")
         except sqlite3.Error as e:
@@ -315,20 +339,63 @@ def scrape_products_data(conn, cursor, categories_to_scrape, old_prices_dict, cu
     return price_change_detected_flag
 
 
+def publish_price_log(conn, new_changes=()):
+    """Re-exports price_changes.csv from price_history, publishes new_changes to
+    the live feed and records a new scrape run.
+
+    price_history is the only source of truth for the CSV. The export and the
+    event publishing run under SQLite's write lock, so scrape ticks and
+    archiving (separate Celery processes) cannot commit rows mid-export, and
+    every event up to the run's last_event_id is in the snapshot. Compressing
+    the snapshot is slow, so it happens after the lock is released; the files
+    and the manifest are then swapped under a second, brief lock, unless a
+    newer export got there first.
+    """
+    snapshot_path = f"{PRICE_LOG_PATH}.{uuid.uuid4().hex}.snapshot"
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        history.export_hot_csv(conn, snapshot_path)
+        for change_details in new_changes:
+            events.publish_price_change(change_details)
+        last_event_id = events.last_event_id()
+        snapshot_ns = time.time_ns()
+    finally:
+        conn.rollback()  # Nothing was written; just releases the lock
+
+    try:
+        http_cache.precompress(snapshot_path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            run = http_cache.current_scrape_run()
+            if run and run.get('snapshot_ns', 0) > snapshot_ns:
+                logger.info("A newer price log was published meanwhile; dropping this snapshot.")
+                return
+            http_cache.install_snapshot(snapshot_path, PRICE_LOG_PATH)
+            http_cache.record_scrape_run([], last_event_id=last_event_id, snapshot_ns=snapshot_ns)
+        finally:
+            conn.rollback()
+    finally:
+        for suffix in ('', *(suffix for _, suffix in http_cache.ENCODING_SUFFIXES)):
+            if os.path.exists(snapshot_path + suffix):
+                os.remove(snapshot_path + suffix)
+
+
 # --- Celery Task Definition ---
-@shared_task(name="run_atomo_scraper")
-def run_atomo_scraper_task():
-    logger.info("Starting Atomo scraper task via Celery...")
+def run_scrape(categories_to_scrape, page_stats=None):
+    """Runs one scrape over categories_to_scrape and publishes the result; returns whether prices changed."""
     conn = None
     changes_found = False
-
-    # current_dolar_rate = get_dolar_crypto_rate() # Uncomment if needed for other purposes
-
     try:
         # DB_PATH and PRICE_LOG_PATH are module-level constants using absolute paths
         conn, cursor = setup_database(DB_PATH)
-        old_prices_data = load_old_prices(conn)
-        changes_found = scrape_products_data(conn, cursor, CATEGORIES, old_prices_data, PRICE_LOG_PATH)
+        history.backfill_from_csv(conn, PRICE_LOG_PATH)
+        product_index = identity.ProductIndex.load(conn, legacy_prices=load_old_prices(conn))
+        recorded_changes = []
+        changes_found = scrape_products_data(conn, cursor, categories_to_scrape, product_index,
+                                             page_stats=page_stats, recorded_changes=recorded_changes)
+        if changes_found:
+            publish_price_log(conn, recorded_changes)
     except sqlite3.Error as db_err:
         logger.error(f"A database error occurred in scraper task: {db_err}", exc_info=True)
     except Exception as e:
@@ -337,6 +404,21 @@ def run_atomo_scraper_task():
         if conn:
             logger.info("Closing database connection for scraper task.")
             conn.close()
+    return changes_found
+
+
+@shared_task(name="run_atomo_scraper")
+def run_atomo_scraper_task():
+    logger.info("Starting Atomo scraper task via Celery...")
+
+    # current_dolar_rate = get_dolar_crypto_rate() # Uncomment if needed for other purposes
+
+    page_stats = {}
+    changes_found = run_scrape(CATEGORIES, page_stats=page_stats)
+    now = timezone.now()
+    # Full crawls spend the same request budget the adaptive ticks draw from.
+    scheduler.charge_requests(CrawlTarget.objects.filter(url__in=list(page_stats)), now)
+    scheduler.record_crawls(page_stats, now)
 
     if changes_found:
         logger.info("Scraper task finished. Price changes were detected and logged.")
@@ -346,4 +428,97 @@ def run_atomo_scraper_task():
 
     logger.info(f"Database used by scraper: {DB_PATH}")
     logger.info(f"Price change log used by scraper: {PRICE_LOG_PATH}")
-    return f"Scraping finished. Changes found: {changes_found}"
\ No newline at end of file
+    return f"Scraping finished. Changes found: {changes_found}"
+
+
+@shared_task(name="scrape_due_pages")
+def scrape_due_pages_task():
+    """Adaptive scheduler tick: scrapes the most volatile due pages within this tick's request budget."""
+    now = timezone.now()
+    limit = scheduler.requests_per_tick(now)
+    if not limit:
+        return "Request budget used up for now."
+    targets = scheduler.due_targets(now, limit)
+    if not targets:
+        return "No pages due."
+    scheduler.charge_requests(targets, now)
+
+    templates = {scheduler.category_name(template): template for template, _ in CATEGORIES}
+    pages_by_category = {}
+    for target in targets:
+        if target.category in templates:
+            pages_by_category.setdefault(templates[target.category], []).append(target.page)
+    logger.info(f"Adaptive tick: scraping {len(targets)} due pages across {len(pages_by_category)} categories.")
+
+    page_stats = {}
+    changes_found = run_scrape(
+        [(template, sorted(pages)) for template, pages in pages_by_category.items()], page_stats=page_stats
+    )
+    # Pages that could not be fetched keep their rate and are simply rescheduled.
+    for target in targets:
+        page_stats.setdefault(target.url, {'listings': None, 'changes': None})
+    scheduler.record_crawls(page_stats, timezone.now())
+    return f"Scraped {len(targets)} pages. Changes found: {changes_found}"
+
+
+def archive_price_history(older_than_days=None):
+    """Moves cold price history into Parquet partitions and re-exports the hot CSV."""
+    older_than_days = settings.PRICE_HISTORY_HOT_DAYS if older_than_days is None else older_than_days
+    conn, _ = setup_database(DB_PATH)
+    try:
+        history.backfill_from_csv(conn, PRICE_LOG_PATH)
+        now = datetime.datetime.now(pytz.utc).astimezone(ARGENTINA_TZ).replace(tzinfo=None)
+        archived = history.archive_cold_history(conn, PRICE_HISTORY_ARCHIVE_DIR, older_than_days, now=now)
+        if archived:
+            publish_price_log(conn)
+    finally:
+        conn.close()
+    logger.info(f"Archived {archived} price changes older than {older_than_days} days into {PRICE_HISTORY_ARCHIVE_DIR}")
+    return archived
+
+
+@shared_task(name="archive_price_history")
+def archive_price_history_task():
+    archived = archive_price_history()
+    return f"Archiving finished. Rows archived: {archived}"
+
+
+# --- Admin Bulk Actions ---
+def finish_bulk_action_job(job_id):
+    """Stamps finished_at once every queued row of the job has been processed."""
+    BulkActionJob.objects.filter(
+        pk=job_id, finished_at__isnull=True, processed__gte=F('total')
+    ).update(finished_at=timezone.now())
+
+
+@shared_task(name="admin_mark_price_zero_batch")
+def mark_price_zero_batch_task(job_id, product_ids):
+    """One batch of the admin's 'Set selected prices to 0' action."""
+    Product.objects.filter(pk__in=product_ids).update(price_ars=0)
+    BulkActionJob.objects.filter(pk=job_id).update(processed=F('processed') + len(product_ids))
+    finish_bulk_action_job(job_id)
+
+
+@shared_task(name="admin_mark_price_zero")
+def mark_price_zero_task(job_id, selection_sql, selection_params):
+    """Runs the admin's 'Set selected prices to 0' action off the request path.
+
+    The selection arrives as the changelist query's SQL (see
+    ProductAdmin.mark_price_zero). It is counted to fill in the job's total,
+    then walked once in primary key order and fanned out into batch tasks.
+    """
+    selection = Product.objects.filter(pk__in=RawSQL(selection_sql, selection_params))
+    batch_size = settings.ADMIN_BULK_ACTION_BATCH_SIZE
+    total = selection.count()
+    BulkActionJob.objects.filter(pk=job_id).update(total=total)
+    product_ids = selection.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    queued = 0
+    while batch := list(itertools.islice(product_ids, batch_size)):
+        mark_price_zero_batch_task.delay(job_id, batch)
+        queued += len(batch)
+    if queued != total:
+        # Rows were added or deleted between the count and the walk.
+        BulkActionJob.objects.filter(pk=job_id).update(total=queued)
+    finish_bulk_action_job(job_id)
+    logger.info(f"Bulk action job {job_id}: queued {queued} products in batches of {batch_size}.")
+    return queued
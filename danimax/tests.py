@@ -1,7 +1,29 @@
+import csv
+import datetime
+import gzip
+import io
+import math
+import os
+import sqlite3
+import tempfile
+import time
+import wsgiref.util
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.db import connections
+from django.db.models import Max, Min
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
 
-from .models import Product
+from dani import storage
+from . import admin, events, history, http_cache, identity, scheduler, tasks, views
+from .models import BulkActionJob, CrawlTarget, Product
 
 
 class ProductModelTest(TestCase):
@@ -82,3 +104,609 @@ class ProductModelTest(TestCase):
                 name="Dup Product",
                 price_ars=100.0
             )
+
+
+class SQLiteStorageTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.db_path = os.path.join(tmp_dir.name, "storage.db")
+
+    def test_writer_connection_uses_wal(self):
+        conn = storage.connect(self.db_path, settings.SQLITE_PRAGMAS)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+    def test_read_only_connection_rejects_writes(self):
+        writer = storage.connect(self.db_path, settings.SQLITE_PRAGMAS)
+        self.addCleanup(writer.close)
+        writer.execute("CREATE TABLE products (url TEXT PRIMARY KEY)")
+        writer.commit()
+
+        reader = storage.connect(self.db_path, settings.SQLITE_PRAGMAS, read_only=True)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM products").fetchone()[0], 0)
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.execute("INSERT INTO products VALUES ('http://example.com')")
+
+    def test_read_only_init_command_skips_write_pragmas(self):
+        command = storage.init_command(settings.SQLITE_PRAGMAS, read_only=True)
+        self.assertNotIn("journal_mode", command)
+        self.assertIn("query_only", command)
+
+
+class ReadOnlyViewTest(TransactionTestCase):
+    # The read-only alias is a separate connection, so rows must be committed to be visible.
+    databases = {'default', settings.READONLY_DATABASE}
+
+    def test_detail_reads_through_read_only_alias(self):
+        product = Product.objects.create(
+            url="http://example.com/product/ro",
+            name="Replica Product",
+            price_ars=10.0,
+            image_url="http://example.com/ro.jpg"
+        )
+        response = self.client.get(f"/{product.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Replica Product")
+
+    def test_index_renders(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "/events/price-changes/")
+
+    def test_detail_missing_product_is_404(self):
+        response = self.client.get("/999999/")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PRICE_EVENTS_BACKEND='memory', PRICE_EVENTS_STREAM_SECONDS=0)
+class PriceChangeStreamTest(TestCase):
+    def setUp(self):
+        events.reset_channel()
+        self.addCleanup(events.reset_channel)
+
+    def publish(self, name, change):
+        return events.publish_price_change({
+            'timestamp': "2025-05-10 09:00:00",
+            'product_id': "1",
+            'product_name': name,
+            'old_price_ars': 100,
+            'new_price_ars': 100 + change,
+            'change_percentage': float(change),
+            'product_url': "http://example.com/product/1"
+        })
+
+    async def read_stream(self, **headers):
+        response = await self.async_client.get("/events/price-changes/", headers=headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_resumes_after_last_event_id(self):
+        first_id = self.publish("Yerba", 10)
+        self.publish("Mate", 20)
+        body = await self.read_stream(**{"Last-Event-ID": first_id})
+        self.assertNotIn("Yerba", body)
+        self.assertIn('"product_name": "Mate"', body)
+
+    async def test_new_connection_starts_at_latest_event(self):
+        self.publish("Yerba", 10)
+        body = await self.read_stream()
+        self.assertTrue(body.startswith("retry:"))
+        self.assertNotIn("Yerba", body)
+
+    @override_settings(PRICE_EVENTS_STREAM_SECONDS=60)
+    def test_wsgi_declines_stream_without_holding_a_worker(self):
+        from dani.wsgi import application
+
+        environ = {}
+        wsgiref.util.setup_testing_defaults(environ)
+        environ.update(PATH_INFO="/events/price-changes/", SERVER_NAME="localhost", HTTP_HOST="localhost")
+        start_response = mock.Mock()
+        started = time.monotonic()
+        b"".join(application(environ, start_response))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(start_response.call_args[0][0], "204 No Content")
+
+    def test_infinite_change_is_published_as_null(self):
+        event_id = self.publish("Freebie", float('inf'))
+        [(read_id, payload)] = events.get_channel().read_since(int(event_id) - 1)
+        self.assertEqual(read_id, event_id)
+        self.assertIsNone(payload['change_percentage'])
+
+
+class HttpCacheTest(TransactionTestCase):
+    databases = {'default', settings.READONLY_DATABASE}
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.csv_path = os.path.join(tmp_dir.name, "price_changes.csv")
+        with open(self.csv_path, 'w', encoding='utf-8') as fh:
+            fh.write("timestamp,product_name\n2025-05-10 09:00:00,Yerba\n")
+        for patcher in (
+            mock.patch.object(http_cache, 'MANIFEST_PATH', os.path.join(tmp_dir.name, "scrape_manifest.json")),
+            mock.patch.object(views, 'PRICE_LOG_PATH', self.csv_path),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        http_cache.record_scrape_run([self.csv_path])
+
+    def test_index_returns_304_for_matching_etag(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("public", response["Cache-Control"])
+        response = self.client.get("/", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("max-age", response["Cache-Control"])
+
+    def test_index_shows_last_scrape_time(self):
+        run = http_cache.current_scrape_run()
+        self.assertContains(self.client.get("/"), f'data-last-scrape="{run["completed_at"].isoformat()}"')
+
+    def test_new_scrape_run_changes_etag(self):
+        etag = self.client.get("/")["ETag"]
+        http_cache.record_scrape_run([self.csv_path])
+        response = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_csv_served_precompressed(self):
+        response = self.client.get("/price_changes.csv", headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn(b"Yerba", gzip.decompress(b"".join(response.streaming_content)))
+
+        response = self.client.get("/price_changes.csv", headers={"If-None-Match": response["ETag"], "Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 304)
+
+    def test_csv_identity_uses_last_run_snapshot(self):
+        with open(self.csv_path, 'a', encoding='utf-8') as fh:
+            fh.write("2025-05-10 21:00:00,Mate\n")
+        response = self.client.get("/price_changes.csv")
+        self.assertNotIn("Content-Encoding", response)
+        body = b"".join(response.streaming_content)
+        self.assertIn(b"Yerba", body)
+        self.assertNotIn(b"Mate", body)
+
+    def test_csv_carries_snapshot_last_event_id(self):
+        self.assertNotIn("X-Price-Events-Last-ID", self.client.get("/price_changes.csv"))
+        http_cache.record_scrape_run([self.csv_path], last_event_id="1700000000000-0")
+        response = self.client.get("/price_changes.csv", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["X-Price-Events-Last-ID"], "1700000000000-0")
+
+    def test_detail_etag_tracks_product(self):
+        product = Product.objects.create(
+            url="http://example.com/product/etag",
+            name="Cached Product",
+            price_ars=10.0,
+            image_url="http://example.com/etag.jpg"
+        )
+        response = self.client.get(f"/{product.id}/")
+        self.assertEqual(response["ETag"].strip('"'), views._detail_etag(None, product.id))
+        self.assertEqual(self.client.get(f"/{product.id}/", headers={"If-None-Match": response["ETag"]}).status_code, 304)
+
+        Product.objects.filter(id=product.id).update(price_ars=12.5)
+        self.assertNotEqual(views._detail_etag(None, product.id), response["ETag"].strip('"'))
+        response = self.client.get(f"/{product.id}/", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "12.5")
+        self.assertIsNone(views._detail_etag(None, 999999))
+
+    def test_detail_ignores_if_modified_since(self):
+        product = Product.objects.create(
+            url="http://example.com/product/modified",
+            name="Edited Product",
+            price_ars=10.0,
+            image_url="http://example.com/modified.jpg"
+        )
+        self.assertNotIn("Last-Modified", self.client.get(f"/{product.id}/"))
+        Product.objects.filter(id=product.id).update(price_ars=0)
+        since = http_cache.scrape_last_modified(None) + datetime.timedelta(hours=1)
+        response = self.client.get(f"/{product.id}/", headers={"If-Modified-Since": http_date(since.timestamp())})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "$0.00")
+
+
+@override_settings(PRICE_EVENTS_BACKEND='memory')
+class PriceHistoryArchiveTest(TestCase):
+    def setUp(self):
+        events.reset_channel()
+        self.addCleanup(events.reset_channel)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = tmp_dir.name
+        self.archive_dir = os.path.join(tmp_dir.name, "archive")
+        self.db_path = os.path.join(tmp_dir.name, "atomo.db")
+        self.conn = sqlite3.connect(self.db_path)
+        self.addCleanup(self.conn.close)
+        history.setup_history_table(self.conn.cursor())
+        history.insert_changes(self.conn.cursor(), [
+            self.change("2025-01-15 09:00:00", "Yerba"),
+            self.change("2025-02-15 09:00:00", "Mate"),
+            self.change("2025-06-01 09:00:00", "Dulce de leche"),
+        ])
+        self.conn.commit()
+        self.now = datetime.datetime(2025, 6, 10)
+
+    def change(self, timestamp, name):
+        return {
+            'timestamp': timestamp,
+            'product_id': "1",
+            'product_name': name,
+            'old_price_ars': 100.0,
+            'new_price_ars': 110.0,
+            'change_percentage': 10.0,
+            'product_url': "http://example.com/product/1"
+        }
+
+    def names(self, **kwargs):
+        return [row['product_name'] for row in history.iter_price_history(self.conn, self.archive_dir, **kwargs)]
+
+    def test_archive_moves_cold_rows_into_month_partitions(self):
+        archived = history.archive_cold_history(self.conn, self.archive_dir, 30, now=self.now)
+        self.assertEqual(archived, 2)
+        self.assertEqual(sorted(os.listdir(self.archive_dir)), ["month=2025-01", "month=2025-02"])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM price_history").fetchone()[0], 1)
+
+    def test_query_combines_tiers_in_order(self):
+        history.archive_cold_history(self.conn, self.archive_dir, 30, now=self.now)
+        self.assertEqual(self.names(), ["Yerba", "Mate", "Dulce de leche"])
+
+    def test_query_prunes_by_date_range(self):
+        history.archive_cold_history(self.conn, self.archive_dir, 30, now=self.now)
+        with mock.patch.object(history.parquet, 'read_table', wraps=history.parquet.read_table) as read_table:
+            self.assertEqual(self.names(start="2025-02", end="2025-06-01"), ["Mate"])
+        self.assertEqual(read_table.call_count, 1)
+
+    def test_export_and_backfill_round_trip(self):
+        csv_path = os.path.join(self.archive_dir + ".csv")
+        history.export_hot_csv(self.conn, csv_path)
+        other = sqlite3.connect(":memory:")
+        self.addCleanup(other.close)
+        history.setup_history_table(other.cursor())
+        self.assertEqual(history.backfill_from_csv(other, csv_path), 3)
+        self.assertEqual(history.backfill_from_csv(other, csv_path), 0)
+        out = io.StringIO()
+        self.assertEqual(history.write_csv(history.iter_price_history(other, self.archive_dir), out), 3)
+
+
+    def test_publish_sends_new_changes_and_records_last_event_id(self):
+        events.publish_price_change(self.change("2025-06-01 09:00:00", "Dulce de leche"))
+        with mock.patch.object(tasks, 'PRICE_LOG_PATH', os.path.join(self.tmp_path, "price_changes.csv")), \
+                mock.patch.object(http_cache, 'MANIFEST_PATH', os.path.join(self.tmp_path, "scrape_manifest.json")):
+            tasks.publish_price_log(self.conn, [self.change("2025-06-01 09:00:00", "Mate")])
+            run = http_cache.current_scrape_run()
+        self.assertEqual(run['last_event_id'], "2")
+        [(_, payload)] = events.get_channel().read_since("1")
+        self.assertEqual(payload['product_name'], "Mate")
+
+    def test_publish_rewrites_csv_from_table_under_write_lock(self):
+        csv_path = os.path.join(self.tmp_path, "price_changes.csv")
+        with open(csv_path, 'w', encoding='utf-8') as fh:
+            fh.write("timestamp,product_name\n2025-06-02 09:00:00,Ghost\n")
+        other = sqlite3.connect(self.db_path, timeout=0)
+        self.addCleanup(other.close)
+        export_hot_csv = history.export_hot_csv
+
+        def export_while_checking_lock(conn, path):
+            with self.assertRaisesRegex(sqlite3.OperationalError, "locked"):
+                other.execute("INSERT INTO price_history (timestamp) VALUES ('2025-06-03 09:00:00')")
+            export_hot_csv(conn, path)
+
+        with mock.patch.object(tasks, 'PRICE_LOG_PATH', csv_path), \
+                mock.patch.object(http_cache, 'MANIFEST_PATH', os.path.join(self.tmp_path, "scrape_manifest.json")), \
+                mock.patch.object(history, 'export_hot_csv', side_effect=export_while_checking_lock):
+            tasks.publish_price_log(self.conn)
+            self.assertIsNotNone(http_cache.current_scrape_run())
+        with open(csv_path, newline='', encoding='utf-8') as fh:
+            self.assertEqual([row['product_name'] for row in csv.DictReader(fh)], ["Yerba", "Mate", "Dulce de leche"])
+        other.execute("INSERT INTO price_history (timestamp) VALUES ('2025-06-03 09:00:00')")
+        other.commit()
+
+    def test_publish_compresses_outside_write_lock(self):
+        csv_path = os.path.join(self.tmp_path, "price_changes.csv")
+        other = sqlite3.connect(self.db_path, timeout=0)
+        self.addCleanup(other.close)
+        precompress = http_cache.precompress
+
+        def precompress_while_writing(path):
+            other.execute("INSERT INTO price_history (timestamp) VALUES ('2025-06-03 09:00:00')")
+            other.commit()
+            precompress(path)
+
+        with mock.patch.object(tasks, 'PRICE_LOG_PATH', csv_path), \
+                mock.patch.object(http_cache, 'MANIFEST_PATH', os.path.join(self.tmp_path, "scrape_manifest.json")), \
+                mock.patch.object(http_cache, 'precompress', side_effect=precompress_while_writing):
+            tasks.publish_price_log(self.conn)
+        with gzip.open(csv_path + ".gz", 'rt', encoding='utf-8') as fh:
+            self.assertEqual(len(list(csv.DictReader(fh))), 3)
+        self.assertEqual(sorted(os.listdir(self.tmp_path)),
+                         ["atomo.db", "price_changes.csv", "price_changes.csv.br", "price_changes.csv.gz",
+                          "scrape_manifest.json"])
+
+    def test_older_snapshot_does_not_replace_newer_one(self):
+        csv_path = os.path.join(self.tmp_path, "price_changes.csv")
+        precompress = http_cache.precompress
+
+        def newer_export_finishes_first(path):
+            http_cache.record_scrape_run([], snapshot_ns=time.time_ns() + 10**9)
+            precompress(path)
+
+        with mock.patch.object(tasks, 'PRICE_LOG_PATH', csv_path), \
+                mock.patch.object(http_cache, 'MANIFEST_PATH', os.path.join(self.tmp_path, "scrape_manifest.json")), \
+                mock.patch.object(http_cache, 'precompress', side_effect=newer_export_finishes_first):
+            tasks.publish_price_log(self.conn)
+        self.assertEqual(sorted(os.listdir(self.tmp_path)), ["atomo.db", "scrape_manifest.json"])
+
+
+class ProductIdentityTest(TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.addCleanup(self.conn.close)
+        self.conn.execute("CREATE TABLE products (url TEXT PRIMARY KEY, name TEXT, price_ars REAL, image_url TEXT, scraped_at TEXT)")
+        identity.setup_identity_tables(self.conn.cursor())
+        identity.save_products(
+            self.conn.cursor(),
+            [(42, "http://example.com/yerba-1kg", "Yerba", 100.0, None, "2025-05-10 09:00:00")],
+            [("http://example.com/yerba-1kg", 42, "2025-05-10 09:00:00")]
+        )
+        self.index = identity.ProductIndex.load(self.conn)
+
+    def test_slug_change_keeps_price_continuity(self):
+        product_id = self.index.resolve("42", "http://example.com/yerba-1kg-nueva")
+        self.assertEqual(product_id, 42)
+        self.assertEqual(self.index.old_price(product_id, "http://example.com/yerba-1kg-nueva"), 100.0)
+        self.assertEqual(self.index.observe(product_id, "http://example.com/yerba-1kg-nueva", 120.0),
+                         "http://example.com/yerba-1kg")
+
+    def test_missing_site_id_resolves_through_alias(self):
+        self.assertEqual(self.index.resolve(None, "http://example.com/yerba-1kg"), 42)
+        self.assertIsNone(self.index.resolve("", "http://example.com/unknown"))
+
+    def test_legacy_url_prices_used_until_id_is_known(self):
+        index = identity.ProductIndex(legacy_prices={"http://example.com/mate": 50.0})
+        self.assertEqual(index.old_price(7, "http://example.com/mate"), 50.0)
+
+    def test_repeat_listing_in_same_run_is_not_a_new_change(self):
+        self.index.observe(42, "http://example.com/yerba-1kg", 120.0)
+        self.assertEqual(self.index.old_price(42, "http://example.com/yerba-1kg"), 120.0)
+
+    def test_save_products_tracks_aliases_and_drains_legacy_rows(self):
+        self.conn.execute("INSERT INTO products VALUES ('http://example.com/yerba-1kg-nueva', 'Yerba', 100.0, NULL, NULL)")
+        identity.save_products(
+            self.conn.cursor(),
+            [(42, "http://example.com/yerba-1kg-nueva", "Yerba", 120.0, None, "2025-05-10 21:00:00")],
+            [("http://example.com/yerba-1kg-nueva", 42, "2025-05-10 21:00:00")]
+        )
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM product_catalog").fetchone()[0], 1)
+        self.assertEqual(
+            self.conn.execute("SELECT COUNT(*) FROM product_aliases WHERE product_id = 42").fetchone()[0], 2)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0], 0)
+
+
+class AdaptiveSchedulerTest(TestCase):
+    def setUp(self):
+        scheduler.sync_crawl_targets([
+            ("https://example.com/833-ofertas?page={}", 1),
+            ("https://example.com/88-mascotas?page={}", 1),
+        ])
+        self.ofertas = CrawlTarget.objects.get(category="833-ofertas")
+        self.mascotas = CrawlTarget.objects.get(category="88-mascotas")
+        self.now = self.ofertas.next_crawl_at
+        # Seed both pages with one crawl so rates are measured over real elapsed time.
+        for target in (self.ofertas, self.mascotas):
+            scheduler.record_crawl(target, 24, 0, self.now - datetime.timedelta(hours=12))
+
+    def test_sync_is_idempotent(self):
+        self.assertEqual(scheduler.sync_crawl_targets([("https://example.com/833-ofertas?page={}", 1)]), 0)
+
+    def test_volatile_page_is_revisited_sooner(self):
+        scheduler.record_crawl(self.ofertas, 24, 12, self.now)
+        scheduler.record_crawl(self.mascotas, 24, 0, self.now)
+        self.assertLess(self.ofertas.interval_minutes, self.mascotas.interval_minutes)
+        self.assertEqual(self.mascotas.interval_minutes, 48 * 60)
+
+    def test_due_targets_prefers_volatile_pages(self):
+        CrawlTarget.objects.update(next_crawl_at=self.now)
+        CrawlTarget.objects.filter(pk=self.ofertas.pk).update(change_rate=0.05)
+        self.assertEqual(scheduler.due_targets(self.now, 1), [self.ofertas])
+
+    def test_default_budget_holds_over_any_24_hours(self):
+        # Every page of every category due at once, and kept due, for two days of ticks.
+        CrawlTarget.objects.all().delete()
+        scheduler.sync_crawl_targets(tasks.CATEGORIES)
+        CrawlTarget.objects.update(next_crawl_at=self.now)
+        budget = settings.ADAPTIVE_SCRAPE_DAILY_REQUEST_BUDGET
+        tick = datetime.timedelta(minutes=settings.ADAPTIVE_SCRAPE_TICK_MINUTES)
+        spent = []
+        for i in range(2 * int(datetime.timedelta(days=1) / tick)):
+            now = self.now + i * tick
+            targets = scheduler.due_targets(now, scheduler.requests_per_tick(now))
+            scheduler.charge_requests(targets, now)
+            spent.append((now, len(targets)))
+        for now, _ in spent:
+            window = sum(count for at, count in spent if now - datetime.timedelta(days=1) < at <= now)
+            self.assertLessEqual(window, budget)
+        self.assertEqual(sum(count for at, count in spent if at < self.now + datetime.timedelta(days=1)), budget)
+        self.assertLessEqual(max(count for _, count in spent), math.ceil(budget / (len(spent) / 2)))
+
+    def test_failed_fetch_keeps_rate(self):
+        rate, last_crawled = self.ofertas.change_rate, self.ofertas.last_crawled_at
+        scheduler.record_crawl(self.ofertas, None, None, self.now)
+        self.assertEqual((self.ofertas.change_rate, self.ofertas.last_crawled_at), (rate, last_crawled))
+        self.assertGreater(self.ofertas.next_crawl_at, self.now)
+
+
+class WebTierBudgetTest(TransactionTestCase):
+    """Query-count budgets and index usage for the hot views, checked against a seeded catalogue."""
+    databases = {'default', settings.READONLY_DATABASE}
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = mock.patch.object(http_cache, 'MANIFEST_PATH', os.path.join(tmp_dir.name, "scrape_manifest.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        http_cache.record_scrape_run([])
+        self.history_db = os.path.join(tmp_dir.name, "atomo.db")
+        call_command('seed_loadtest_data', products=50, changes=500, history_db=self.history_db, allow_live_db=True,
+                     stdout=io.StringIO())
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections[settings.READONLY_DATABASE]) as readonly:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(default) + len(readonly)
+
+    def test_index_query_budget(self):
+        self.assertEqual(self.count_queries("/"), 0)
+
+    def test_detail_query_budget(self):
+        product = Product.objects.order_by('?').first()
+        # One lookup for the ETag, one for the page.
+        self.assertLessEqual(self.count_queries(f"/{product.id}/"), 2)
+
+    def test_admin_changelist_queries_do_not_grow_with_catalogue(self):
+        self.client.force_login(self.admin)
+        baseline = self.count_queries("/admin/danimax/product/")
+        call_command('seed_loadtest_data', products=200, history_db=self.history_db, allow_live_db=True,
+                     stdout=io.StringIO())
+        self.assertEqual(self.count_queries("/admin/danimax/product/"), baseline)
+        # Session, user, the estimated count's MIN and MAX, page, the date
+        # drill-down's MIN and MAX (looked up by the start level and again by
+        # datetimes()), plus one EXISTS probe per year the seeded dates span.
+        self.assertLessEqual(baseline, 11)
+
+    def test_hot_lookups_use_indexes(self):
+        product = Product.objects.first()
+        self.assertIn("USING INTEGER PRIMARY KEY", Product.objects.filter(id=product.id).explain())
+        self.assertIn("USING INDEX", Product.objects.filter(url=product.url).explain())
+        conn = sqlite3.connect(self.history_db)
+        self.addCleanup(conn.close)
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM price_history WHERE timestamp >= ? ORDER BY timestamp", ("2025-01",)
+        ))
+        self.assertIn("USING INDEX price_history_timestamp", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_seeding_refuses_live_targets_by_default(self):
+        products = Product.objects.count()
+        with self.assertRaisesMessage(CommandError, "--allow-live-db"):
+            call_command('seed_loadtest_data', products=1, stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), products)
+        with self.assertRaisesMessage(CommandError, "--history-db"):
+            call_command('seed_loadtest_data', products=0, changes=1, stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, "--allow-live-csv"):
+            call_command('seed_loadtest_data', products=0, changes=1, history_db=self.history_db, export_csv=True,
+                         stdout=io.StringIO())
+
+    def test_loadtest_reports_percentiles(self):
+        out = io.StringIO()
+        call_command('loadtest', requests=5, concurrency=1, endpoints='index,detail', stdout=out)
+        report = out.getvalue()
+        self.assertIn("p99 ms", report)
+        self.assertRegex(report, r"detail\s+5\s+0\s")
+
+
+class ScalableAdminTest(TestCase):
+    def setUp(self):
+        start = datetime.datetime(2025, 11, 30, 12, tzinfo=datetime.timezone.utc)
+        for i in range(30):
+            product = Product.objects.create(url=f"http://example.com/{i}", name=f"P{i}", price_ars=100 + i,
+                                             image_url="http://example.com/i.jpg")
+            Product.objects.filter(pk=product.pk).update(scraped_at=start + datetime.timedelta(days=i % 5))
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.admin)
+
+    def test_datetimes_matches_default_implementation(self):
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                queryset = Product.objects.filter(price_ars__gte=110)
+                self.assertEqual(list(queryset.datetimes('scraped_at', kind, order)),
+                                 list(QuerySet.datetimes(queryset, 'scraped_at', kind, order)))
+        self.assertEqual(Product.objects.none().datetimes('scraped_at', 'day'), [])
+
+    def assertNoTableScans(self, queries):
+        # Only the page itself may walk the scraped_at index, in order and up to its LIMIT.
+        with connections['default'].cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith("SELECT") or "danimax_product" not in sql:
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for step in (row[-1] for row in cursor.fetchall()):
+                    if step.startswith("SCAN danimax_product"):
+                        self.assertIn("USING INDEX danimax_product_scraped_idx", step, sql)
+                        self.assertIn(" LIMIT ", sql)
+
+    def test_estimated_count_avoids_full_count(self):
+        paginator = admin.EstimatedCountPaginator(Product.objects.order_by('-scraped_at', '-id'), 10)
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertEqual(paginator.count, 30)
+        self.assertEqual(len(queries), 2)
+        self.assertNoTableScans(queries)
+        with override_settings(ADMIN_ESTIMATED_COUNT_CAP=5):
+            filtered = admin.EstimatedCountPaginator(Product.objects.filter(price_ars__gte=110), 10)
+            self.assertEqual(filtered.count, 5)
+
+    @mock.patch.object(admin.ProductAdmin, 'list_per_page', 12)
+    def test_cursor_pages_through_changelist(self):
+        seen = []
+        query_string = ""
+        while query_string is not None:
+            response = self.client.get("/admin/danimax/product/" + query_string)
+            self.assertEqual(response.status_code, 200)
+            seen += [product.pk for product in response.context['cl'].result_list]
+            query_string = response.context.get('next_cursor_url')
+        expected = list(Product.objects.order_by('-scraped_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.client.get("/admin/danimax/product/?cursor=garbage").status_code, 200)
+
+    def test_date_bounds_match_min_max(self):
+        queryset = Product.objects.filter(price_ars__gte=110)
+        bounds = queryset.aggregate(first=Min('scraped_at'), last=Max('scraped_at'))
+        self.assertEqual(queryset.date_bounds('scraped_at'), (bounds['first'], bounds['last']))
+        self.assertEqual(Product.objects.filter(price_ars__lt=0).date_bounds('scraped_at'), (None, None))
+
+    @mock.patch.object(admin.ProductAdmin, 'list_per_page', 12)
+    def test_changelist_date_drill_down_never_scans_the_table(self):
+        product = Product.objects.create(url="http://example.com/old", name="Old", price_ars=1,
+                                         image_url="http://example.com/i.jpg")
+        Product.objects.filter(pk=product.pk).update(scraped_at=datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc))
+        for query_string in ("", "?scraped_at__year=2025", "?scraped_at__year=2025&scraped_at__month=12"):
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = self.client.get("/admin/danimax/product/" + query_string)
+            self.assertEqual(response.status_code, 200)
+            self.assertNoTableScans(queries)
+        self.assertContains(response, "scraped_at__day=4")
+
+    def test_scraped_at_ordering_uses_index(self):
+        plan = Product.objects.order_by('-scraped_at', '-id').explain()
+        self.assertIn("danimax_product_scraped_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    @override_settings(ADMIN_BULK_ACTION_BATCH_SIZE=7)
+    def test_mark_price_zero_runs_in_batches(self):
+        with mock.patch.object(tasks.mark_price_zero_task, 'delay') as queue_job:
+            response = self.client.post("/admin/danimax/product/?q=P1", {
+                'action': 'mark_price_zero', 'select_across': '1', 'index': '0',
+                '_selected_action': list(Product.objects.values_list('pk', flat=True)[:1]),
+            })
+        self.assertEqual(response.status_code, 302)
+        job = BulkActionJob.objects.get()
+        self.assertEqual((job.total, job.get_progress()), (0, "0%"))
+        self.assertFalse(Product.objects.filter(price_ars=0).exists())
+
+        with mock.patch.object(tasks.mark_price_zero_batch_task, 'delay',
+                               side_effect=tasks.mark_price_zero_batch_task) as delay:
+            self.assertEqual(tasks.mark_price_zero_task(*queue_job.call_args.args), 11)
+        self.assertEqual(delay.call_count, 2)
+        # Only the search results (P1, P10-P19) were selected.
+        self.assertEqual(set(Product.objects.filter(price_ars=0).values_list('name', flat=True)),
+                         {"P1", *(f"P{i}" for i in range(10, 20))})
+        job.refresh_from_db()
+        self.assertEqual((job.processed, job.total, job.get_progress()), (11, 11, "100%"))
+        self.assertIsNotNone(job.finished_at)
@@ -1,18 +1,110 @@
-from django.http import Http404
+import asyncio
+import gzip
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 
+from danimax import events, http_cache
 from danimax.models import Product
+from danimax.tasks import PRICE_LOG_PATH
+
+
+def _detail_etag(request, product_id):
+    if http_cache.current_scrape_run() is None:
+        return None
+    product = (
+        Product.objects.using(settings.READONLY_DATABASE)
+        .filter(id=product_id)
+        .values_list("url", "name", "price_ars", "image_url")
+        .first()
+    )
+    return http_cache.scrape_etag("detail", product_id, product) if product else None
+
+def _price_changes_etag(request):
+    encoding, _ = http_cache.negotiate_encoding(request, PRICE_LOG_PATH)
+    return http_cache.scrape_etag("price_changes.csv", encoding or "identity")
 
 
+@http_cache.cache_per_scrape(lambda request: http_cache.scrape_etag("index"))
 def index(request):
-    products = Product.objects.all()
-    context = {"products": products}
+    products = Product.objects.using(settings.READONLY_DATABASE).all()
+    run = http_cache.current_scrape_run()
+    context = {"products": products, "last_scrape": run["completed_at"] if run else None}
     return render(request, "danimax/index.html", context)
 
+# Products also change through the admin, between scrape runs, so the scrape
+# time is no Last-Modified for them.
+@http_cache.cache_per_scrape(_detail_etag, last_modified_func=None)
 def detail(request, product_id):
     try:
-        product = Product.objects.get(id=product_id)
+        product = Product.objects.using(settings.READONLY_DATABASE).get(id=product_id)
     except Product.DoesNotExist:
         raise Http404("Product does not exist")
     context = {"product": product}
-    return render(request, "danimax/detail.html", context)
\ No newline at end of file
+    return render(request, "danimax/detail.html", context)
+
+@http_cache.cache_per_scrape(_price_changes_etag)
+def price_changes_csv(request):
+    """Serves the price change log, precompressed once per scrape run."""
+    # Read the run before opening the payload: a newer payload than the run
+    # only repeats live events, an older one would miss some.
+    run = http_cache.current_scrape_run()
+    encoding, path = http_cache.negotiate_encoding(request, PRICE_LOG_PATH)
+    if encoding is None and os.path.isfile(PRICE_LOG_PATH + ".gz"):
+        # Serve the snapshot taken at the end of the last run, same as the compressed variants.
+        payload = gzip.open(PRICE_LOG_PATH + ".gz", "rb")
+    elif os.path.isfile(path):
+        payload = open(path, "rb")
+    else:
+        raise Http404("No price changes recorded yet")
+    response = FileResponse(payload, content_type="text/csv; charset=utf-8", filename="price_changes.csv")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    if run and run.get("last_event_id"):
+        # The page subscribes to the live feed right after this snapshot.
+        response["X-Price-Events-Last-ID"] = run["last_event_id"]
+    return response
+
+async def price_change_stream(request):
+    """Streams price changes as server-sent events, resuming after Last-Event-ID if given.
+
+    Meant to be served through dani/asgi.py, where an open stream is a parked
+    coroutine rather than a worker. A WSGI worker would be held for as long as
+    the tab stays open, so there the view answers 204 at once: EventSource
+    stops reconnecting and the page falls back to polling price_changes.csv.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    channel = events.get_channel()
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    if not last_event_id:
+        last_event_id = await sync_to_async(channel.last_id, thread_sensitive=False)()
+    response = StreamingHttpResponse(_price_change_events(channel, last_event_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx-style proxies from buffering the stream
+    return response
+
+async def _price_change_events(channel, last_event_id):
+    # Connections are recycled after PRICE_EVENTS_STREAM_SECONDS; EventSource
+    # reconnects on its own and sends back the last ID it saw.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.PRICE_EVENTS_STREAM_SECONDS
+    last_sent = loop.time()
+    yield f"retry: {settings.PRICE_EVENTS_RETRY_MS}\n\n"
+    while True:
+        batch = await sync_to_async(channel.read_since, thread_sensitive=False)(last_event_id)
+        for event_id, payload in batch:
+            last_event_id = event_id
+            yield f"id: {event_id}\ndata: {json.dumps(payload)}\n\n"
+            last_sent = loop.time()
+        if loop.time() >= deadline:
+            break
+        if loop.time() - last_sent >= settings.PRICE_EVENTS_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = loop.time()
+        await asyncio.sleep(settings.PRICE_EVENTS_POLL_SECONDS)